@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuctionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auction'
+
+    def ready(self):
+        import auction.signals
@@ -0,0 +1,206 @@
+"""
+Benchmark of the sync and async read views.
+
+ReadBenchmark serves the same mix of reads, the auction list and detail,
+the comment list and user_info, through either:
+
+- the sync DRF views, run in a thread as Django's ASGI handler runs them
+- the async views, awaited on the event loop
+
+with each request in its own ThreadSensitiveContext, as the ASGI handler
+gives it.  Alongside the reads two probes time, every PROBE_INTERVAL:
+
+- a database_sync_to_async call, as AuctionConsumer makes
+- a bid, applied by the accept path in the bids executor pool
+
+Slow probes are reads starving the websockets or the bids of threads.
+
+It is run by ``python manage.py benchmark_reads``, which sets up a throwaway
+database around it.
+"""
+import asyncio
+import itertools
+import time
+from decimal import Decimal
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from server.executors import BIDS, database_sync_to_async
+from user.views import AsyncUserInfoView, user_info
+from .bidding import accept_bid
+from .loadtest import percentile
+from .models import Auction, Bid, Comment
+from .views.auction import (
+    AsyncAuctionDetailView,
+    AsyncAuctionListView,
+    AuctionDetailView,
+    AuctionListView,
+)
+from .views.comment import AsyncCommentListView, ManageCommentView
+
+
+# Seconds between two calls of the probe
+PROBE_INTERVAL = 0.005
+
+SYNC_VIEWS = {
+    'auction_list': AuctionListView.as_view(),
+    'auction_detail': AuctionDetailView.as_view(),
+    'manage_comment': ManageCommentView.as_view(),
+    'user_info': user_info,
+}
+
+ASYNC_VIEWS = {
+    'auction_list': AsyncAuctionListView.as_view(),
+    'auction_detail': AsyncAuctionDetailView.as_view(),
+    'manage_comment': AsyncCommentListView.as_view(),
+    'user_info': AsyncUserInfoView.as_view(),
+}
+
+
+class ReadBenchmark:
+    """
+    Requests reads, concurrency at a time, through the sync or async views.
+    """
+
+    def __init__(self, auctions=20, bids=10, comments=10, requests=500, concurrency=20):
+        self.auction_count = auctions
+        self.bid_count = bids
+        self.comment_count = comments
+        self.request_count = requests
+        self.concurrency = concurrency
+
+    def setup(self):
+        """
+        Creates the auctions with their bids and comments, and the user
+        reading them.
+        """
+        password = make_password('benchmark')
+        seller = User.objects.create(username='benchmark-seller', password=password)
+        bidder = User.objects.create(username='benchmark-bidder', password=password)
+        self.token = Token.objects.create(user=bidder).key
+
+        auctions = Auction.objects.bulk_create([
+            Auction(
+                seller=seller,
+                title=f'Benchmark auction {i}',
+                starting_price=Decimal('1.00'),
+                end_time=timezone.now() + timezone.timedelta(days=1),
+                bid_count=self.bid_count,
+                comment_count=self.comment_count,
+            )
+            for i in range(self.auction_count)
+        ])
+        Bid.objects.bulk_create([
+            Bid(auction=auction, bidder=bidder, amount=Decimal(2 + i))
+            for auction in auctions for i in range(self.bid_count)
+        ])
+        Comment.objects.bulk_create([
+            Comment(auction=auction, user=bidder, comment_text=f'Comment {i}')
+            for auction in auctions for i in range(self.comment_count)
+        ])
+        self.auction_ids = [auction.pk for auction in auctions]
+
+        # The probed bids go to an auction of their own, taking turns
+        rival = User.objects.create(username='benchmark-rival', password=password)
+        self.bidders = itertools.cycle([bidder.pk, rival.pk])
+        self.bid_auction_id = Auction.objects.create(
+            seller=seller,
+            title='Benchmark bids',
+            starting_price=Decimal('1.00'),
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        ).pk
+        self.bid_amounts = itertools.count(2)
+
+        routes = itertools.cycle(['auction_list', 'auction_detail', 'manage_comment', 'user_info'])
+        auction_ids = itertools.cycle(self.auction_ids)
+        self.reads = [(next(routes), next(auction_ids)) for _ in range(self.request_count)]
+
+    async def run(self, mode):
+        """
+        Serves the reads through the 'sync' or 'async' views and returns the
+        results.
+        """
+        self.latencies = []
+        self.probes = []
+        self.bids = []
+        self.errors = 0
+        self.running = True
+        serve = self.serve_sync if mode == 'sync' else self.serve_async
+
+        probes = [asyncio.create_task(self.probe()), asyncio.create_task(self.probe_bids())]
+        reads = iter(self.reads)
+        start = time.perf_counter()
+        await asyncio.gather(*(self.work(reads, serve) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        self.running = False
+        await asyncio.gather(*probes)
+
+        return {
+            'mode': mode,
+            'elapsed': elapsed,
+            'requests': len(self.reads),
+            'errors': self.errors,
+            'latency_p50': percentile(self.latencies, 50),
+            'latency_p95': percentile(self.latencies, 95),
+            'latency_p99': percentile(self.latencies, 99),
+            'probes': len(self.probes),
+            'probe_p50': percentile(self.probes, 50),
+            'probe_p95': percentile(self.probes, 95),
+            'probe_p99': percentile(self.probes, 99),
+            'bids': len(self.bids),
+            'bid_p50': percentile(self.bids, 50),
+            'bid_p95': percentile(self.bids, 95),
+            'bid_p99': percentile(self.bids, 99),
+        }
+
+    async def work(self, reads, serve):
+        for name, auction_id in reads:
+            kwargs = {} if name in ('auction_list', 'user_info') else {'pk': auction_id}
+            path = reverse(name, kwargs=kwargs)
+            headers = {'accept': 'application/json'}
+            if name == 'user_info':
+                headers['authorization'] = f'Token {self.token}'
+
+            start = time.perf_counter()
+            async with ThreadSensitiveContext():
+                status = await serve(name, path, headers, kwargs)
+                await sync_to_async(close_old_connections)()
+            self.latencies.append(time.perf_counter() - start)
+            if status != 200:
+                self.errors += 1
+
+    async def serve_sync(self, name, path, headers, kwargs):
+        def call():
+            response = SYNC_VIEWS[name](RequestFactory().get(path, headers=headers), **kwargs)
+            response.render()
+            return response.status_code
+        return await sync_to_async(call)()
+
+    async def serve_async(self, name, path, headers, kwargs):
+        response = await ASYNC_VIEWS[name](AsyncRequestFactory().get(path, headers=headers), **kwargs)
+        return response.status_code
+
+    async def probe(self):
+        auction_id = self.auction_ids[0]
+
+        def read():
+            return Auction.objects.filter(pk=auction_id).exists()
+
+        while self.running:
+            start = time.perf_counter()
+            await database_sync_to_async(read)()
+            self.probes.append(time.perf_counter() - start)
+            await asyncio.sleep(PROBE_INTERVAL)
+
+    async def probe_bids(self):
+        while self.running:
+            start = time.perf_counter()
+            await database_sync_to_async(accept_bid, pool=BIDS)(
+                self.bid_auction_id, next(self.bidders), Decimal(next(self.bid_amounts)))
+            self.bids.append(time.perf_counter() - start)
+            await asyncio.sleep(PROBE_INTERVAL)
@@ -0,0 +1,119 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from server.metrics import BIDS
+from .broadcast import bid_update
+from .events import append_event
+from .models import Auction, Bid
+
+
+class BidRejected(Exception):
+    """
+    Raised when a bid loses the compare-and-swap on the auction row.
+    """
+    OUTBID = 'outbid'
+    OWN_AUCTION = 'own_auction'
+    OWN_BID = 'own_bid'
+    INACTIVE = 'inactive'
+    ENDED = 'ended'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, message, code, current_bid=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.current_bid = current_bid
+
+    def as_dict(self):
+        return {
+            'error': self.message,
+            'code': self.code,
+            'current_bid': None if self.current_bid is None else str(self.current_bid),
+        }
+
+
+def accept_bid(auction_id, bidder_id, amount):
+    """
+    Accepts a bid, or raises BidRejected.
+
+    The auction row is moved to the new bid with a single conditional
+    UPDATE, which only matches while the auction is active, not ended, not
+    the bidder's own, not already led by the bidder and below the amount.
+    The bid is inserted in the same transaction.  Of any number of
+    concurrent bids, exactly the ones that still beat the current bid when
+    they reach the row are accepted, and the others are told they lost.
+
+    The bid_update event of the bid is stored with it, and left on
+    bid.event for the caller to broadcast.
+    """
+    places = Bid._meta.get_field('amount').decimal_places
+    amount = Decimal(str(amount)).quantize(Decimal(1).scaleb(-places))
+    now = timezone.now()
+    bid = Bid(auction_id=auction_id, bidder_id=bidder_id, amount=amount)
+
+    beats_current = (
+        Q(current_bid__lt=amount)
+        | Q(current_bid__isnull=True, starting_price__lt=amount)
+    )
+    with transaction.atomic():
+        updated = Auction.objects.filter(
+            beats_current,
+            pk=auction_id,
+            is_active=True,
+            end_time__gt=now,
+        ).exclude(
+            seller=bidder_id,
+        ).exclude(
+            current_bidder=bidder_id,
+        ).update(
+            current_bid=amount,
+            current_bidder=bidder_id,
+            # The foreign key is checked at commit, after the insert below
+            highest_bid=bid.pk,
+            bid_count=F('bid_count') + 1,
+            event_seq=F('event_seq') + 1,
+            updated_at=now,
+        )
+        if not updated:
+            rejection = get_rejection(auction_id, bidder_id, amount, now)
+            BIDS.labels(result=rejection.code).inc()
+            raise rejection
+        bid.save(update_auction=False)
+
+        # The bidder is now the current bidder of the locked row
+        seq, username = Auction.objects.filter(pk=auction_id).values_list(
+            'event_seq', 'current_bidder__username').get()
+        bid.event = append_event(
+            auction_id, seq, 'bid_update', {'bid': bid_update(bid, username)})
+    BIDS.labels(result='accepted').inc()
+    return bid
+
+
+def get_rejection(auction_id, bidder_id, amount, now):
+    """
+    Explains why the compare-and-swap for a bid did not match.
+    """
+    auction = Auction.objects.filter(pk=auction_id).values(
+        'seller', 'is_active', 'end_time', 'starting_price',
+        'current_bid', 'current_bidder').first()
+    if auction is None:
+        return BidRejected('Auction does not exist.', BidRejected.NOT_FOUND)
+
+    current_bid = auction['current_bid']
+    if auction['seller'] == bidder_id:
+        return BidRejected(
+            'You cannot bid on your own auction.', BidRejected.OWN_AUCTION, current_bid)
+    if not auction['is_active']:
+        return BidRejected('Auction is not active.', BidRejected.INACTIVE, current_bid)
+    if auction['end_time'] <= now:
+        return BidRejected('Auction has ended.', BidRejected.ENDED, current_bid)
+    if auction['current_bidder'] == bidder_id:
+        return BidRejected(
+            'You cannot outbid on yourself.', BidRejected.OWN_BID, current_bid)
+    if current_bid is None:
+        return BidRejected(
+            'Bid must be higher than the starting price.', BidRejected.OUTBID, current_bid)
+    return BidRejected(
+        'You have been outbid. Bid must be higher than the current highest bid.',
+        BidRejected.OUTBID, current_bid)
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import threading
+import time
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from server.metrics import BROADCAST_FRAMES, GROUP_SENDS, PUBLISH_LATENCY
+
+
+logger = logging.getLogger(__name__)
+
+
+def auction_group_name(auction_id):
+    return f'auction_{auction_id}'
+
+
+def get_coalesce_window():
+    """
+    Returns the coalescing window of bid_update broadcasts in seconds, from
+    the setting AUCTION_BROADCAST_COALESCE_MS.  0 sends every bid at once.
+    """
+    return getattr(settings, 'AUCTION_BROADCAST_COALESCE_MS', 0) / 1000
+
+
+def bid_update(bid, username):
+    """
+    Builds the JSON-safe bid_update payload for an accepted bid, placed by
+    the user named username.
+    """
+    return {
+        'auction_id': bid.auction_id,
+        'id': str(bid.id),
+        'amount': str(bid.amount),
+        'created_at': bid.created_at.isoformat(),
+        'bidder': {'id': bid.bidder_id, 'username': username},
+        'current_bid': str(bid.amount),
+        'bid_count_delta': 1,
+    }
+
+
+class BroadcastCoalescer:
+    """
+    Collapses the bid_update frames of an auction within a window into one.
+
+    The first frame of an auction opens a window and schedules its flush on
+    the running loop, which sends, when the window closes, the frame of the
+    highest bid seen, with bid_count_delta set to the number of bids it
+    stands for.  Frames arriving while the window is open only replace the
+    pending one.  Either way send returns at once.
+
+    Any other frame of the auction has a higher seq than the pending one,
+    and the sockets drop frames older than the last they were sent, so
+    flush() closes the window early to send the pending frame first.
+
+    A flush cancelled before its window closes sends at once rather than
+    drop its frame.  asyncio.run cancels the tasks left when its loop ends,
+    so a sync caller without an outer event loop, as under WSGI, sends its
+    frames uncoalesced before async_to_sync returns.
+
+    received and sent count the frames in and the group sends out, so
+    received - sent is the fan-out saved.  The same counts are exported by
+    server.metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timers = {}
+        self.received = 0
+        self.sent = 0
+
+    @property
+    def saved(self):
+        return self.received - self.sent
+
+    def count_direct(self):
+        with self.lock:
+            self.received += 1
+            self.sent += 1
+        BROADCAST_FRAMES.labels(outcome='received').inc()
+        BROADCAST_FRAMES.labels(outcome='sent').inc()
+
+    def stats(self):
+        return {'received': self.received, 'sent': self.sent, 'saved': self.saved}
+
+    async def send(self, auction_id, frame, window):
+        BROADCAST_FRAMES.labels(outcome='received').inc()
+        with self.lock:
+            self.received += 1
+            pending = self.pending.get(auction_id)
+            if pending is not None:
+                delta = pending['bid']['bid_count_delta'] + frame['bid']['bid_count_delta']
+                # Bids can reach here out of order, the highest is the latest
+                if Decimal(frame['bid']['amount']) > Decimal(pending['bid']['amount']):
+                    pending.update(frame, bid=dict(frame['bid']))
+                pending['bid']['bid_count_delta'] = delta
+                BROADCAST_FRAMES.labels(outcome='saved').inc()
+                return
+            self.pending[auction_id] = {**frame, 'bid': dict(frame['bid'])}
+            # The loop only keeps weak references to its tasks
+            wake = asyncio.Event()
+            timer = asyncio.get_running_loop().create_task(
+                self.flush_after(auction_id, window, wake))
+            self.timers[auction_id] = (timer, wake)
+
+    async def flush_after(self, auction_id, window, wake):
+        try:
+            await asyncio.wait_for(wake.wait(), window)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        await self.send_pending(auction_id, asyncio.current_task())
+
+    async def flush(self, auction_id):
+        """
+        Sends the pending frame of the auction now, if there is one, and
+        returns once it has been sent.
+        """
+        with self.lock:
+            timer, wake = self.timers.get(auction_id, (None, None))
+        if timer is None:
+            return
+        if timer.get_loop() is asyncio.get_running_loop():
+            # The timer may be sending already, waiting for it keeps the order
+            wake.set()
+            await asyncio.shield(timer)
+        else:
+            await self.send_pending(auction_id)
+
+    async def send_pending(self, auction_id, timer=None):
+        """
+        Sends the pending frame of the auction.  A timer only sends the
+        frame of its own window.
+        """
+        with self.lock:
+            current = self.timers.get(auction_id, (None, None))[0]
+            if current is None or timer is not None and current is not timer:
+                return
+            del self.timers[auction_id]
+            frame = self.pending.pop(auction_id)
+            self.sent += 1
+        BROADCAST_FRAMES.labels(outcome='sent').inc()
+        if frame['bid']['bid_count_delta'] > 1:
+            logger.debug('Coalesced %d bid updates on auction %s',
+                         frame['bid']['bid_count_delta'], auction_id)
+        try:
+            await group_send_event(auction_id, frame)
+        except Exception:
+            logger.exception('Could not broadcast %s on auction %s', frame['type'], auction_id)
+
+
+coalescer = BroadcastCoalescer()
+
+
+async def group_send_event(auction_id, frame):
+    start = time.perf_counter()
+    await get_channel_layer().group_send(auction_group_name(auction_id), {
+        'type': 'send_event',
+        'auction_id': int(auction_id),
+        'event': frame,
+    })
+    PUBLISH_LATENCY.observe(time.perf_counter() - start)
+    GROUP_SENDS.labels(type=frame['type']).inc()
+
+
+async def broadcast_event(auction_id, frame):
+    """
+    Sends an event frame to every socket watching the auction.  bid_update
+    frames are coalesced with the other bids of the auction within
+    AUCTION_BROADCAST_COALESCE_MS, and other frames wait for the pending
+    one to be sent.  A failure to publish is logged, as the
+    event itself has already been committed.
+    """
+    auction_id = int(auction_id)
+    window = get_coalesce_window()
+    try:
+        if frame['type'] == 'bid_update' and window > 0:
+            await coalescer.send(auction_id, frame, window)
+        else:
+            # A pending bid_update has a lower seq, and would be dropped by
+            # the sockets if it came after this frame
+            await coalescer.flush(auction_id)
+            coalescer.count_direct()
+            await group_send_event(auction_id, frame)
+    except Exception:
+        logger.exception('Could not broadcast %s on auction %s', frame['type'], auction_id)
+
+
+def broadcast_event_sync(auction_id, frame):
+    async_to_sync(broadcast_event)(auction_id, frame)
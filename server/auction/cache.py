@@ -0,0 +1,204 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from .models import Auction
+
+
+AUCTION_LIST_VERSION_KEY = 'auction:list:version'
+
+# How long a snapshot build may hold its lock, and how long others wait for it
+SNAPSHOT_LOCK_TIMEOUT = 10
+SNAPSHOT_WAIT_INTERVAL = 0.05
+SNAPSHOT_WAIT_ATTEMPTS = 40
+
+
+def get_auction_list_timeout():
+    """
+    Seconds a cached auction list page may be served for.  This bounds how
+    stale a page can get from changes that are not driven by a write, such
+    as an auction passing its end time.
+    """
+    return getattr(settings, 'AUCTION_LIST_CACHE_TIMEOUT', 30)
+
+
+def get_http_max_age():
+    """
+    Seconds a reverse proxy may reuse a public auction response for before
+    revalidating it with its ETag.
+    """
+    return getattr(settings, 'AUCTION_HTTP_MAX_AGE', 5)
+
+
+def get_auction_snapshot_timeout():
+    """
+    Seconds a cached auction snapshot may be served for.  Snapshots are
+    invalidated on every bid and cancel, so this only bounds the memory
+    held by auctions nobody watches.
+    """
+    return getattr(settings, 'AUCTION_SNAPSHOT_CACHE_TIMEOUT', 300)
+
+
+def make_etag(*parts):
+    """
+    Returns a strong ETag for the given version parts.
+    """
+    version = '|'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+
+def set_cache_headers(response, etag, last_modified=None, public=True):
+    """
+    Sets the validators and Cache-Control on a 200 or 304 response.  Public
+    responses may be shared by a reverse proxy, private ones must be
+    revalidated on every use.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if public:
+        patch_cache_control(response, public=True, max_age=get_http_max_age())
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def get_auction_list_version():
+    return cache.get_or_set(AUCTION_LIST_VERSION_KEY, 1, timeout=None)
+
+
+async def aget_auction_list_version():
+    return await cache.aget_or_set(AUCTION_LIST_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_auction_list():
+    """
+    Bumps the list version, so every cached page is skipped from now on and
+    left to expire.
+    """
+    cache.add(AUCTION_LIST_VERSION_KEY, 1, timeout=None)
+    cache.incr(AUCTION_LIST_VERSION_KEY)
+
+
+def auction_list_cache_key(request, paginator):
+    """
+    Returns the cache key for an auction list request, built from the
+    normalized query.  Returns None for queries that should not be cached.
+    """
+    digest = auction_list_query_digest(request, paginator)
+    if digest is None:
+        return None
+    return f'auction:list:v{get_auction_list_version()}:{digest}'
+
+
+async def aauction_list_cache_key(request, paginator):
+    """
+    auction_list_cache_key for async views.
+    """
+    digest = auction_list_query_digest(request, paginator)
+    if digest is None:
+        return None
+    return f'auction:list:v{await aget_auction_list_version()}:{digest}'
+
+
+def auction_list_query_digest(request, paginator):
+    params = request.query_params
+
+    is_active = params.get('is_active')
+    if is_active is not None:
+        is_active = is_active.lower()
+        if is_active not in ('true', 'false'):
+            return None
+
+    ordering = params.get(paginator.ordering_query_param, paginator.default_ordering)
+    if ordering not in paginator.orderings:
+        return None
+
+    query = '|'.join([
+        # Pagination links are absolute, so they depend on the host
+        request.get_host(),
+        is_active or 'all',
+        ordering,
+        str(paginator.get_page_size(request)),
+        params.get(paginator.cursor_query_param, ''),
+    ])
+    return hashlib.sha1(query.encode('utf-8')).hexdigest()
+
+
+def auction_snapshot_version_key(auction_id):
+    return f'auction:{auction_id}:snapshot:version'
+
+
+def invalidate_auction_snapshot(auction_id):
+    """
+    Bumps the snapshot version of an auction, so its cached snapshot is
+    skipped from now on and left to expire.
+    """
+    key = auction_snapshot_version_key(auction_id)
+    cache.add(key, 1, timeout=None)
+    cache.incr(key)
+
+
+def build_auction_snapshot(auction_id):
+    """
+    Reads the JSON-safe snapshot of an auction sent to new sockets, or
+    None if it does not exist.
+    """
+    auction = Auction.objects.filter(pk=auction_id).first()
+    if auction is None:
+        return None
+    return {
+        'id': auction.pk,
+        'seller': auction.seller_id,
+        'title': auction.title,
+        'description': auction.description,
+        'image_url': auction.image_url,
+        'starting_price': str(auction.starting_price),
+        'current_bid': None if auction.current_bid is None else str(auction.current_bid),
+        'current_bidder': auction.current_bidder_id,
+        'bid_count': auction.bid_count,
+        'end_time': auction.end_time.isoformat(),
+        'created_at': auction.created_at.isoformat(),
+        'updated_at': auction.updated_at.isoformat(),
+        'is_active': auction.is_active,
+        'seq': auction.event_seq,
+    }
+
+
+def get_auction_snapshot(auction_id):
+    """
+    Returns the snapshot of an auction, shared through the cache by every
+    connection and worker.
+
+    Only one caller rebuilds a missing snapshot: it takes a lock in the
+    cache, and the others wait for its result instead of all reading the
+    database at once.  A caller that waits too long builds the snapshot
+    itself.  The version is read before the database, so a snapshot built
+    from a row that changed meanwhile is stored under a stale version.
+    """
+    version = cache.get_or_set(auction_snapshot_version_key(auction_id), 1, timeout=None)
+    key = f'auction:{auction_id}:snapshot:v{version}'
+
+    # Missing auctions are cached as False, to tell them from a cache miss
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return snapshot or None
+
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, timeout=SNAPSHOT_LOCK_TIMEOUT)
+    if not locked:
+        for _ in range(SNAPSHOT_WAIT_ATTEMPTS):
+            time.sleep(SNAPSHOT_WAIT_INTERVAL)
+            snapshot = cache.get(key)
+            if snapshot is not None:
+                return snapshot or None
+
+    try:
+        snapshot = build_auction_snapshot(auction_id)
+        cache.set(key, snapshot or False, timeout=get_auction_snapshot_timeout())
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return snapshot
@@ -0,0 +1,106 @@
+"""
+Closing auctions at their end time.
+
+AuctionCloser keeps the end times of the auctions due within a lookahead
+window in a min-heap, read from the (is_active, end_time) range of the
+auction table, and closes them in bulk as they come due.  The heap is
+rebuilt from the table on every rescan, so a restarted closer picks up
+where the last one stopped, including auctions that ended while it was
+down.  It is run by ``python manage.py close_auctions``.
+"""
+import heapq
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .broadcast import broadcast_event_sync
+from .cache import invalidate_auction_list, invalidate_auction_snapshot
+from .events import append_event
+from .models import Auction
+
+
+def close_auctions(auction_ids, now=None):
+    """
+    Closes those of the given auctions that are still active and past
+    their end time, in one update, and makes their current bidder the
+    winner.  Broadcasts an auction_closed event for each one and returns
+    the events.
+
+    accept_bid only matches auctions before their end time, so no bid can
+    land on an auction after it has been picked here.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Auction.objects.select_for_update()
+            .filter(pk__in=auction_ids, is_active=True, end_time__lte=now)
+            .values_list('pk', flat=True)
+        )
+        if not ids:
+            return []
+
+        Auction.objects.filter(pk__in=ids).update(
+            is_active=False,
+            winner=F('current_bidder'),
+            event_seq=F('event_seq') + 1,
+            updated_at=now,
+        )
+        rows = Auction.objects.filter(pk__in=ids).values_list(
+            'pk', 'event_seq', 'current_bid', 'winner', 'winner__username')
+        events = [
+            append_event(pk, seq, 'auction_closed', {
+                'final_bid': None if current_bid is None else str(current_bid),
+                'winner': None if winner is None else {'id': winner, 'username': username},
+            })
+            for pk, seq, current_bid, winner, username in rows
+        ]
+
+        # update() sends no signals, so invalidate the caches here
+        transaction.on_commit(invalidate_auction_list)
+        for pk in ids:
+            transaction.on_commit(lambda pk=pk: invalidate_auction_snapshot(pk))
+
+    for event in events:
+        broadcast_event_sync(event.auction_id, event.as_frame())
+    return events
+
+
+class AuctionCloser:
+    """
+    Min-heap of (end_time, pk) of the active auctions ending within
+    lookahead, closed in batches of batch_size as they come due.
+    """
+
+    def __init__(self, lookahead, batch_size):
+        self.lookahead = lookahead
+        self.batch_size = batch_size
+        self.heap = []
+
+    def rescan(self, now):
+        """
+        Rebuilds the heap from the auctions that are active and end before
+        now + lookahead, overdue ones included.  Returns their number.
+        """
+        rows = Auction.objects.filter(
+            is_active=True, end_time__lte=now + self.lookahead,
+        ).order_by('end_time', 'pk').values_list('end_time', 'pk')
+        # Rows sorted by end time already form a heap
+        self.heap = list(rows)
+        return len(self.heap)
+
+    def next_end_time(self):
+        return self.heap[0][0] if self.heap else None
+
+    def close_due(self, now):
+        """
+        Closes every auction of the heap that is due.  Returns the number
+        of auctions closed.
+        """
+        closed = 0
+        while self.heap and self.heap[0][0] <= now:
+            batch = []
+            while self.heap and self.heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self.heap)[1])
+            # Auctions canceled or extended meanwhile are skipped, an
+            # extended one is back in the heap after the next rescan
+            closed += len(close_auctions(batch, now))
+        return closed
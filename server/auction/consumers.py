@@ -1,26 +1,75 @@
 import json
+from urllib.parse import parse_qs
 
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from channels.layers import get_channel_layer
+from rest_framework.exceptions import ValidationError
+from server.executors import database_sync_to_async
+from server.metrics import BIDS, GROUP_DELIVERIES, WEBSOCKET_CONNECTIONS, join_group, leave_group
+from .bidding import BidRejected
+from .broadcast import auction_group_name
+from .cache import get_auction_snapshot
+from .events import get_missed_events
 from .models import Auction
+from .sequencer import BidQueueTimeout, submit_bid
+from .serializers import BidSerializer
+
+
+def get_max_subscriptions():
+    return getattr(settings, 'AUCTION_WS_MAX_SUBSCRIPTIONS', 100)
+
+
+def get_auction_states(auction_ids):
+    """
+    Returns the compact state of each existing auction, by id.
+    """
+    states = {}
+    rows = Auction.objects.filter(pk__in=auction_ids).values_list(
+        'pk', 'event_seq', 'current_bid', 'bid_count', 'is_active')
+    for pk, seq, current_bid, bid_count, is_active in rows:
+        states[pk] = {
+            'auction': pk,
+            'seq': seq,
+            'current_bid': None if current_bid is None else str(current_bid),
+            'bid_count': bid_count,
+            'is_active': is_active,
+        }
+    return states
 
 
 class AuctionConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.auction_id = self.scope['url_route']['kwargs']['pk']
-        self.auction_group_name = f'auction_{self.auction_id}'
+        self.auction_group_name = auction_group_name(self.auction_id)
 
         # Join auction group
         await self.channel_layer.group_add(
             self.auction_group_name,
             self.channel_name
         )
+        WEBSOCKET_CONNECTIONS.labels(consumer='auction').inc()
+        join_group(self.auction_id)
 
         await self.accept()
 
+        # Events up to last_seq have been sent, later ones come from the group
+        self.last_seq = 0
+
+        # A reconnecting socket is replayed the events it missed, if they
+        # are still buffered
+        since = self.get_since()
+        if since is not None:
+            missed = await database_sync_to_async(get_missed_events)(self.auction_id, since)
+            if missed is not None:
+                self.last_seq = since
+                for frame in missed:
+                    await self.send_event({'event': frame})
+                return
+
         # Get initial data
         initial_data = await self.get_initial_data()
+        if initial_data is not None:
+            self.last_seq = initial_data['seq']
         await self.send(text_data=json.dumps({
             'type': 'initial_data',
             'data': initial_data
@@ -32,58 +81,192 @@ class AuctionConsumer(AsyncWebsocketConsumer):
             self.auction_group_name,
             self.channel_name
         )
+        WEBSOCKET_CONNECTIONS.labels(consumer='auction').dec()
+        leave_group(self.auction_id)
 
     async def receive(self, text_data=None):
-        text_data_json = json.loads(text_data)
+        try:
+            text_data_json = json.loads(text_data)
+        except (TypeError, ValueError):
+            text_data_json = None
+        if not isinstance(text_data_json, dict):
+            await self.send_json_frame({'type': 'error', 'error': 'Invalid JSON.'})
+            return
         message_type = text_data_json.get('type')
 
         if message_type == 'bid':
             bid_data = text_data_json.get('bid')
             if bid_data:
-                await self.handle_bid(bid_data)
+                await self.handle_bid(bid_data, text_data_json.get('ref'))
 
-    async def send_bid_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'bid_update',
-            'bid': event['bid']
-        }))
+    async def send_event(self, event):
+        GROUP_DELIVERIES.labels(consumer='auction').inc()
+        frame = event['event']
+        # Skip events already covered by the snapshot or the replay
+        if frame['seq'] <= self.last_seq:
+            return
+        self.last_seq = frame['seq']
+        await self.send(text_data=json.dumps(frame))
 
-    @database_sync_to_async
-    def get_initial_data(self):
+    def get_since(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
         try:
-            auction = Auction.objects.get(pk=self.auction_id)
-            return {
-                'id': auction.pk,
-                'seller': auction.seller,
-                'title': auction.title,
-                'description': auction.description,
-                'image_url': auction.image_url,
-                'starting_price': auction.starting_price,
-                'current_bid': auction.current_bid,
-                'end_time': auction.end_time.isoformat(),
-                'created_at': auction.created_at.isoformat(),
-                'updated_at': auction.updated_at.isoformat(),
-                'is_active': auction.is_active
-            }
-        except Auction.DoesNotExist:
+            since = int(query['since'][0])
+        except (KeyError, ValueError):
             return None
+        return since if since >= 0 else None
 
-    @database_sync_to_async
-    def handle_bid(self, bid_data):
+    async def send_json_frame(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    async def get_initial_data(self):
+        return await database_sync_to_async(get_auction_snapshot)(self.auction_id)
+
+    async def handle_bid(self, bid_data, ref=None):
         """
-        Handle a bid received from the websocket.
+        Handle a bid received from the websocket.  The bid goes through the
+        same accept path as place_bid, which broadcasts it to the group, and
+        the sender gets a bid_ack or bid_nack frame.
         """
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.send_nack(ref, {'error': 'Authentication required.', 'code': 'not_authenticated'})
+            return
+
+        try:
+            amount = BidSerializer().fields['amount'].run_validation(
+                bid_data.get('amount') if isinstance(bid_data, dict) else None)
+        except ValidationError as e:
+            BIDS.labels(result='invalid').inc()
+            await self.send_nack(ref, {'error': e.detail[0], 'code': 'invalid'})
+            return
+
+        try:
+            bid = await submit_bid(int(self.auction_id), user.pk, amount)
+        except BidRejected as e:
+            await self.send_nack(ref, e.as_dict())
+            return
+        except BidQueueTimeout:
+            await self.send_nack(ref, {
+                'error': 'The bid was not processed in time. It may still be accepted.',
+                'code': 'timeout',
+            })
+            return
+
+        await self.send_json_frame({'type': 'bid_ack', 'ref': ref, 'bid': bid})
+
+    async def send_nack(self, ref, reason):
+        await self.send_json_frame({'type': 'bid_nack', 'ref': ref, **reason})
+
+
+class AuctionSubscriptionConsumer(AsyncWebsocketConsumer):
+    """
+    One socket for watching many auctions, e.g. a live auction list.
+
+    The client sends {"type": "subscribe", "auctions": [<id>, ...]} and
+    {"type": "unsubscribe", "auctions": [...]}.  A subscribe is answered
+    with the current state of each auction found, and the ids that were
+    not found or went over AUCTION_WS_MAX_SUBSCRIPTIONS.  From then on,
+    the socket gets compact frames: {"type": "price", "auction", "seq",
+    "current_bid", "bid_count_delta"} for bids, and {"type", "auction",
+    "seq"} for other events.
+    """
+
+    async def connect(self):
+        # Maps each subscribed auction to the last seq sent for it
+        self.subscriptions = {}
+        await self.accept()
+        WEBSOCKET_CONNECTIONS.labels(consumer='subscription').inc()
+
+    async def disconnect(self, close_code):
+        for auction_id in list(self.subscriptions):
+            await self.leave(auction_id)
+        WEBSOCKET_CONNECTIONS.labels(consumer='subscription').dec()
+
+    async def receive(self, text_data=None):
         try:
-            auction = Auction.objects.get(pk=self.auction_id)
-            # Validate bid
+            text_data_json = json.loads(text_data)
+            message_type = text_data_json['type']
+            auction_ids = self.get_auction_ids(text_data_json['auctions'])
+        except (TypeError, ValueError, KeyError):
+            await self.send_json_frame({'type': 'error', 'error': 'Invalid message.'})
+            return
+
+        if message_type == 'subscribe':
+            await self.subscribe(auction_ids)
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(auction_ids)
+        else:
+            await self.send_json_frame({'type': 'error', 'error': 'Invalid message.'})
 
-            new_price = float(bid_data['amount'])
-            auction.current_bid = new_price
-            auction.save()
+    def get_auction_ids(self, auction_ids):
+        if not isinstance(auction_ids, list):
+            raise ValueError
+        return list(dict.fromkeys(int(auction_id) for auction_id in auction_ids))
 
-            channel_layer = get_channel_layer()
-            # Send bid update to auction group
+    async def subscribe(self, auction_ids):
+        new_ids = [
+            auction_id for auction_id in auction_ids
+            if auction_id not in self.subscriptions
+        ]
+        room = max(get_max_subscriptions() - len(self.subscriptions), 0)
+        new_ids, rejected = new_ids[:room], new_ids[room:]
+
+        # Join before reading the state, so no event falls in between
+        for auction_id in new_ids:
+            self.subscriptions[auction_id] = 0
+            await self.channel_layer.group_add(
+                auction_group_name(auction_id), self.channel_name)
+            join_group(auction_id)
+
+        states = await database_sync_to_async(get_auction_states)(new_ids)
+        for auction_id in new_ids:
+            state = states.get(auction_id)
+            if state is None:
+                rejected.append(auction_id)
+                await self.leave(auction_id)
+            else:
+                self.subscriptions[auction_id] = max(
+                    self.subscriptions[auction_id], state['seq'])
+
+        await self.send_json_frame({
+            'type': 'subscribed',
+            'auctions': list(states.values()),
+            'rejected': rejected,
+        })
+
+    async def unsubscribe(self, auction_ids):
+        for auction_id in auction_ids:
+            if auction_id in self.subscriptions:
+                await self.leave(auction_id)
+        await self.send_json_frame({'type': 'unsubscribed', 'auctions': auction_ids})
+
+    async def leave(self, auction_id):
+        del self.subscriptions[auction_id]
+        await self.channel_layer.group_discard(
+            auction_group_name(auction_id), self.channel_name)
+        leave_group(auction_id)
+
+    async def send_event(self, event):
+        GROUP_DELIVERIES.labels(consumer='subscription').inc()
+        auction_id = event['auction_id']
+        frame = event['event']
+        # Skip events of dropped auctions, or covered by the subscribe state
+        if frame['seq'] <= self.subscriptions.get(auction_id, frame['seq']):
+            return
+        self.subscriptions[auction_id] = frame['seq']
+
+        if frame['type'] == 'bid_update':
+            compact = {
+                'type': 'price',
+                'auction': auction_id,
+                'seq': frame['seq'],
+                'current_bid': frame['bid']['current_bid'],
+                'bid_count_delta': frame['bid']['bid_count_delta'],
+            }
+        else:
+            compact = {'type': frame['type'], 'auction': auction_id, 'seq': frame['seq']}
+        await self.send_json_frame(compact)
 
-        except Auction.DoesNotExist:
-            print(f"Auction with id {self.auction_id} does not exist.")
-            pass
+    async def send_json_frame(self, content):
+        await self.send(text_data=json.dumps(content))
@@ -0,0 +1,60 @@
+"""
+Sequence-numbered auction events.
+
+Every change broadcast to the sockets of an auction is numbered by
+Auction.event_seq and stored as an AuctionEvent in the same transaction as
+the change.  Only the last AUCTION_EVENT_BUFFER_SIZE events of each auction
+are kept: a socket that reconnects with ``?since=<seq>`` is replayed the
+events it missed if they are all still there, and sent a full snapshot
+otherwise.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Auction, AuctionEvent
+
+
+def get_event_buffer_size():
+    return getattr(settings, 'AUCTION_EVENT_BUFFER_SIZE', 100)
+
+
+def append_event(auction_id, seq, type, data):
+    """
+    Stores event seq of an auction and drops the events that fell out of
+    the buffer.  The caller must have taken seq from Auction.event_seq in
+    the current transaction.
+    """
+    event = AuctionEvent.objects.create(
+        auction_id=auction_id, seq=seq, type=type, data=data)
+    AuctionEvent.objects.filter(
+        auction_id=auction_id, seq__lte=seq - get_event_buffer_size()).delete()
+    return event
+
+
+def record_event(auction_id, type, data=None):
+    """
+    Takes the next sequence number of an auction and stores an event with
+    it.
+    """
+    with transaction.atomic():
+        Auction.objects.filter(pk=auction_id).update(event_seq=F('event_seq') + 1)
+        seq = Auction.objects.filter(pk=auction_id).values_list('event_seq', flat=True).get()
+        return append_event(auction_id, seq, type, data or {})
+
+
+def get_missed_events(auction_id, since):
+    """
+    Returns the frames of the events after since, in order, or None if some
+    of them are no longer in the buffer.
+    """
+    current = Auction.objects.filter(pk=auction_id).values_list('event_seq', flat=True).first()
+    if current is None or since > current:
+        return None
+    if since == current:
+        return []
+
+    events = list(
+        AuctionEvent.objects.filter(auction_id=auction_id, seq__gt=since).order_by('seq'))
+    if not events or events[0].seq != since + 1:
+        return None
+    return [event.as_frame() for event in events]
@@ -0,0 +1,253 @@
+"""
+In-process load test of the ASGI application.
+
+LoadTest drives the application directly, without a server or network:
+HTTP requests go through HttpCommunicator and watchers through
+WebsocketCommunicator, all on one event loop.  Bids are placed through
+place_bid, reads alternate between the auction list and detail, and every
+watcher records when each bid_update reaches it.  The bid to broadcast
+delay of a delivery runs from the start of the bid request to the watcher
+receiving the frame.
+
+It is run by ``python manage.py loadtest``, which sets up a throwaway
+database, by throwaway_database(), and the in-memory channel layer around it.
+"""
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from server.executors import shutdown_executors
+from .models import Auction
+
+
+HOST = b'localhost'
+
+# Seconds a watcher may go without a frame before the drain gives up on it
+DRAIN_TIMEOUT = 5
+
+
+def percentile(values, p):
+    """
+    Returns the nearest-rank p-th percentile of values, or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Runs the block against a test database created from the configured
+    one, and destroyed afterwards.  The configured database is not touched.
+    """
+    # Each request runs in its own thread, with its own connection.  An
+    # in-memory SQLite database fails them with "table is locked" where
+    # a file waits for the lock.
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'loadtest.sqlite3')
+
+    old_name = connection.settings_dict['NAME']
+    # Connecting to a SQLite file that does not exist creates it, empty
+    missing = (connection.vendor == 'sqlite' and not connection.is_in_memory_db()
+               and not os.path.exists(old_name))
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        # The pool threads keep their connections, which would reopen the
+        # configured database once its name is restored
+        shutdown_executors()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir)
+        if missing and os.path.exists(old_name) and not os.path.getsize(old_name):
+            os.remove(old_name)
+
+
+class LoadTest:
+    """
+    A mix of bids, reads and watchers over a set of auctions, run by up to
+    concurrency requests at a time.
+    """
+
+    def __init__(self, application, auctions=1, bidders=20, watchers=100,
+                 bids=500, reads=500, concurrency=20, seed=0):
+        self.application = application
+        self.auction_count = auctions
+        self.bidder_count = bidders
+        self.watcher_count = watchers
+        self.bid_count = bids
+        self.read_count = reads
+        self.concurrency = concurrency
+        self.random = random.Random(seed)
+
+    def setup(self):
+        """
+        Creates the seller, the bidders with their tokens, and the auctions.
+        """
+        password = make_password('loadtest')
+        seller = User.objects.create(username='loadtest-seller', password=password)
+        bidders = User.objects.bulk_create([
+            User(username=f'loadtest-bidder-{i}', password=password)
+            for i in range(self.bidder_count)
+        ])
+        tokens = Token.objects.bulk_create([
+            Token(user=bidder, key=Token.generate_key()) for bidder in bidders
+        ])
+        self.tokens = [token.key for token in tokens]
+        self.auction_ids = [
+            Auction.objects.create(
+                seller=seller,
+                title=f'Load test auction {i}',
+                starting_price=Decimal('1.00'),
+                end_time=timezone.now() + timezone.timedelta(days=1),
+            ).pk
+            for i in range(self.auction_count)
+        ]
+
+        # Amounts rise by one per bid, so most bids beat the current one
+        self.prices = {pk: itertools.count(2) for pk in self.auction_ids}
+        self.jobs = ['bid'] * self.bid_count + ['read'] * self.read_count
+        self.random.shuffle(self.jobs)
+
+    async def run(self):
+        """
+        Runs the jobs against connected watchers and returns the results.
+        """
+        self.bid_starts = {}
+        self.arrivals = []
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.expected_deliveries = 0
+        self.watchers_by_auction = {pk: 0 for pk in self.auction_ids}
+
+        watchers = []
+        for i in range(self.watcher_count):
+            auction_id = self.auction_ids[i % len(self.auction_ids)]
+            watchers.append(await self.connect_watcher(auction_id))
+            self.watchers_by_auction[auction_id] += 1
+        listeners = [asyncio.create_task(self.listen(communicator)) for communicator in watchers]
+
+        jobs = iter(self.jobs)
+        start = time.perf_counter()
+        await asyncio.gather(*(self.work(jobs) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        await self.drain()
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        for communicator in watchers:
+            await communicator.disconnect()
+
+        delays = [
+            arrival - self.bid_starts[bid_id]
+            for bid_id, arrival in self.arrivals
+            if bid_id in self.bid_starts
+        ]
+        return {
+            'elapsed': elapsed,
+            'requests': len(self.jobs),
+            'bids': self.bid_count,
+            'reads': self.read_count,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'watchers': self.watcher_count,
+            'deliveries': len(self.arrivals),
+            'delay_p50': percentile(delays, 50),
+            'delay_p95': percentile(delays, 95),
+            'delay_p99': percentile(delays, 99),
+        }
+
+    async def connect_watcher(self, auction_id):
+        communicator = WebsocketCommunicator(
+            self.application, f'/ws/auction/{auction_id}/',
+            headers=[(b'host', HOST), (b'origin', b'http://' + HOST)])
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Watcher could not connect to auction {auction_id}.')
+        await communicator.receive_json_from()
+        return communicator
+
+    async def listen(self, communicator):
+        while True:
+            frame = json.loads(await communicator.receive_from(timeout=None))
+            if frame['type'] == 'bid_update':
+                self.arrivals.append((frame['bid']['id'], time.perf_counter()))
+
+    async def drain(self):
+        """
+        Waits for the broadcasts of the accepted bids to reach every watcher,
+        until no frame has arrived for DRAIN_TIMEOUT.
+        """
+        seen = len(self.arrivals)
+        idle_since = time.perf_counter()
+        while len(self.arrivals) < self.expected_deliveries:
+            await asyncio.sleep(0.01)
+            if len(self.arrivals) > seen:
+                seen = len(self.arrivals)
+                idle_since = time.perf_counter()
+            elif time.perf_counter() - idle_since > DRAIN_TIMEOUT:
+                break
+
+    async def work(self, jobs):
+        for job in jobs:
+            if job == 'bid':
+                await self.place_bid()
+            else:
+                await self.read()
+
+    async def place_bid(self):
+        auction_id = self.random.choice(self.auction_ids)
+        token = self.random.choice(self.tokens)
+        body = json.dumps({'amount': str(next(self.prices[auction_id]))}).encode()
+        start = time.perf_counter()
+        response = await self.request(
+            'POST', reverse('place_bid', kwargs={'pk': auction_id}), body,
+            [(b'content-type', b'application/json'),
+             (b'authorization', f'Token {token}'.encode())])
+
+        if response['status'] == 201:
+            self.accepted += 1
+            self.expected_deliveries += self.watchers_by_auction[auction_id]
+            self.bid_starts[json.loads(response['body'])['id']] = start
+        elif response['status'] in (400, 403, 409):
+            self.rejected += 1
+        else:
+            self.errors += 1
+
+    async def read(self):
+        if self.random.random() < 0.5:
+            path = reverse('auction_list')
+        else:
+            path = reverse('auction_detail', kwargs={'pk': self.random.choice(self.auction_ids)})
+        response = await self.request('GET', path)
+        if response['status'] != 200:
+            self.errors += 1
+
+    async def request(self, method, path, body=b'', headers=()):
+        headers = [(b'host', HOST), (b'content-length', str(len(body)).encode()), *headers]
+        communicator = HttpCommunicator(self.application, method, path, body, headers)
+        response = await communicator.get_response(timeout=60)
+        await communicator.wait()
+        return response
@@ -0,0 +1,95 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from auction.benchmark import ReadBenchmark
+from auction.loadtest import throwaway_database
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the sync read views against their async versions, in-process, and "
+            "reports their latency and that of concurrent websocket database calls.  Runs "
+            "against a throwaway test database created from the configured one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auctions',
+            type=int,
+            default=20,
+            help="Number of auctions read (default: 20).",
+        )
+        parser.add_argument(
+            '--bids',
+            type=int,
+            default=10,
+            help="Number of bids per auction (default: 10).",
+        )
+        parser.add_argument(
+            '--comments',
+            type=int,
+            default=10,
+            help="Number of comments per auction (default: 10).",
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help="Number of reads served by each path (default: 500).",
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help="Number of reads in flight at a time (default: 20).",
+        )
+        parser.add_argument(
+            '--shared-executor',
+            action='store_true',
+            help="Run every database call in the shared executor, with the executor "
+                 "pools disabled.",
+        )
+
+    def handle(self, *args, **options):
+        # Every list read goes to the database, as a cache miss does, and the
+        # request factories send their own host
+        overrides = {
+            'AUCTION_LIST_CACHE_TIMEOUT': 0,
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        }
+        if options['shared_executor']:
+            overrides['EXECUTOR_POOLS'] = {**getattr(settings, 'EXECUTOR_POOLS', {}), 'ENABLED': False}
+        with throwaway_database(), override_settings(**overrides):
+            benchmark = ReadBenchmark(
+                auctions=options['auctions'],
+                bids=options['bids'],
+                comments=options['comments'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+            )
+            benchmark.setup()
+            results = [async_to_sync(benchmark.run)(mode) for mode in ('sync', 'async')]
+
+        for result in results:
+            self.report(result)
+
+    def report(self, results):
+        elapsed = results['elapsed']
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{results['mode'].capitalize()} views"))
+        self.stdout.write(
+            f"  Reads: {results['requests']} in {elapsed:.2f}s "
+            f"({results['requests'] / elapsed:.1f}/s), {results['errors']} errors")
+        self.stdout.write(
+            "  Read latency: "
+            f"p50 {results['latency_p50'] * 1000:.1f}ms, "
+            f"p95 {results['latency_p95'] * 1000:.1f}ms, "
+            f"p99 {results['latency_p99'] * 1000:.1f}ms")
+        for label, key, count in (('Websocket database calls', 'probe', 'probes'),
+                                  ('Bids', 'bid', 'bids')):
+            if results[f'{key}_p50'] is None:
+                self.stdout.write(self.style.WARNING(f"  {label}: none made."))
+                continue
+            self.stdout.write(
+                f"  {label}: {results[count]}, "
+                f"p50 {results[f'{key}_p50'] * 1000:.1f}ms, "
+                f"p95 {results[f'{key}_p95'] * 1000:.1f}ms, "
+                f"p99 {results[f'{key}_p99'] * 1000:.1f}ms")
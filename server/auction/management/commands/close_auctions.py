@@ -0,0 +1,67 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from auction.closing import AuctionCloser
+
+
+class Command(BaseCommand):
+    help = "Closes auctions at their end time and records their winners.  Runs until stopped, unless --once."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookahead',
+            type=int,
+            default=300,
+            help="Seconds ahead to load end times into the schedule (default: 300).",
+        )
+        parser.add_argument(
+            '--rescan-interval',
+            type=int,
+            default=30,
+            help="Seconds between rescans of the auction table, which bounds how late "
+                 "an auction created with a short end time is closed (default: 30).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Number of auctions to close per transaction (default: 500).",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Close the auctions already due and exit.",
+        )
+
+    def handle(self, *args, **options):
+        lookahead = timezone.timedelta(seconds=options['lookahead'])
+        rescan_interval = timezone.timedelta(seconds=options['rescan_interval'])
+        closer = AuctionCloser(lookahead, options['batch_size'])
+
+        if options['once']:
+            closer.rescan(timezone.now())
+            closed = closer.close_due(timezone.now())
+            self.stdout.write(self.style.SUCCESS(f"Closed {closed} auctions."))
+            return
+
+        # Rescan right away, to close what ended while no closer was running
+        next_rescan = timezone.now()
+        try:
+            while True:
+                now = timezone.now()
+                if now >= next_rescan:
+                    scheduled = closer.rescan(now)
+                    next_rescan = now + rescan_interval
+                    self.stdout.write(f"Scheduled {scheduled} auctions.")
+
+                closed = closer.close_due(now)
+                if closed:
+                    self.stdout.write(self.style.SUCCESS(f"Closed {closed} auctions."))
+
+                wakeup = next_rescan
+                next_end_time = closer.next_end_time()
+                if next_end_time is not None:
+                    wakeup = min(wakeup, next_end_time)
+                time.sleep(max((wakeup - timezone.now()).total_seconds(), 0))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -0,0 +1,106 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from auction.loadtest import LoadTest, throwaway_database
+
+
+class Command(BaseCommand):
+    help = ("Load tests the ASGI application in-process, with the in-memory channel layer, "
+            "and reports throughput and bid to broadcast delays.  Runs against a throwaway "
+            "test database created from the configured one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--auctions',
+            type=int,
+            default=1,
+            help="Number of auctions bid on and watched (default: 1).",
+        )
+        parser.add_argument(
+            '--bidders',
+            type=int,
+            default=20,
+            help="Number of users placing bids (default: 20).",
+        )
+        parser.add_argument(
+            '--watchers',
+            type=int,
+            default=100,
+            help="Number of websockets watching the auctions, spread evenly (default: 100).",
+        )
+        parser.add_argument(
+            '--bids',
+            type=int,
+            default=500,
+            help="Number of bids to place (default: 500).",
+        )
+        parser.add_argument(
+            '--reads',
+            type=int,
+            default=500,
+            help="Number of auction list and detail reads, mixed with the bids (default: 500).",
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help="Number of requests in flight at a time (default: 20).",
+        )
+        parser.add_argument(
+            '--sequencer',
+            action='store_true',
+            help="Place bids through the in-process bid sequencer.",
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the job mix (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {
+            'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+        }
+        if options['sequencer']:
+            overrides['AUCTION_BID_SEQUENCER'] = {
+                'ENABLED': True,
+                'BACKEND': 'auction.sequencer.InMemoryBidQueue',
+            }
+
+        with throwaway_database(), override_settings(**overrides):
+            from server.asgi import application
+            load_test = LoadTest(
+                application,
+                auctions=options['auctions'],
+                bidders=options['bidders'],
+                watchers=options['watchers'],
+                bids=options['bids'],
+                reads=options['reads'],
+                concurrency=options['concurrency'],
+                seed=options['seed'],
+            )
+            load_test.setup()
+            results = async_to_sync(load_test.run)()
+
+        self.report(results)
+
+    def report(self, results):
+        elapsed = results['elapsed']
+        self.stdout.write(
+            f"Requests: {results['requests']} in {elapsed:.2f}s "
+            f"({results['requests'] / elapsed:.1f}/s), {results['errors']} errors")
+        self.stdout.write(
+            f"Bids: {results['bids']} ({results['bids'] / elapsed:.1f}/s), "
+            f"{results['accepted']} accepted, {results['rejected']} rejected")
+        self.stdout.write(f"Reads: {results['reads']} ({results['reads'] / elapsed:.1f}/s)")
+        self.stdout.write(
+            f"Broadcasts: {results['deliveries']} deliveries to {results['watchers']} watchers")
+        if results['delay_p50'] is None:
+            self.stdout.write(self.style.WARNING("No bid reached a watcher."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            "Bid to broadcast: "
+            f"p50 {results['delay_p50'] * 1000:.1f}ms, "
+            f"p95 {results['delay_p95'] * 1000:.1f}ms, "
+            f"p99 {results['delay_p99'] * 1000:.1f}ms"))
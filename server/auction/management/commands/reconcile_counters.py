@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from auction.cache import invalidate_auction_list, invalidate_auction_snapshot
+from auction.models import Auction
+
+
+COUNTERS = ('bid_count', 'like_count', 'comment_count')
+
+
+class Command(BaseCommand):
+    help = "Recounts bids, likes and comments and fixes any drift in the Auction counter columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help="Number of auctions to recount per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report drift without writing any changes.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        checked = 0
+        fixed = 0
+        last_pk = 0
+        while True:
+            # Walk the table by primary key so each chunk is an index range
+            # scan, and lock the chunk so concurrent increments are not lost
+            with transaction.atomic():
+                queryset = Auction.objects.filter(pk__gt=last_pk)
+                if not dry_run:
+                    queryset = queryset.select_for_update()
+                chunk = list(
+                    queryset.with_actual_counts()
+                    .order_by('pk')
+                    .only('pk', *COUNTERS)[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                drifted = []
+                for auction in chunk:
+                    changed = False
+                    for field in COUNTERS:
+                        actual = getattr(auction, f'actual_{field}')
+                        if getattr(auction, field) != actual:
+                            self.stdout.write(
+                                f"Auction {auction.pk}: {field} {getattr(auction, field)} -> {actual}")
+                            setattr(auction, field, actual)
+                            changed = True
+                    if changed:
+                        drifted.append(auction)
+
+                if drifted and not dry_run:
+                    Auction.objects.bulk_update(drifted, COUNTERS)
+                    for auction in drifted:
+                        transaction.on_commit(
+                            lambda pk=auction.pk: invalidate_auction_snapshot(pk))
+
+            checked += len(chunk)
+            fixed += len(drifted)
+            last_pk = chunk[-1].pk
+
+        if fixed and not dry_run:
+            # bulk_update sends no signals, so invalidate the caches here
+            invalidate_auction_list()
+
+        verb = "Found" if dry_run else "Fixed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} auctions. {verb} {fixed} with drifted counters."))
@@ -0,0 +1,263 @@
+import random
+import time
+import uuid
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from auction.cache import invalidate_auction_list
+from auction.models import Auction, Bid, Comment, Like
+from user.models import UserProfile
+
+
+PASSWORD = 'password'
+
+BID_INCREMENT = Decimal('1.00')
+
+COMMENTS = (
+    'Nice pic!!',
+    'Is this still available?',
+    'What condition is it in?',
+    'Does it ship internationally?',
+    'Great price.',
+)
+
+
+def skewed_counts(total, n, skew, rng):
+    """
+    Splits total into n counts following a Zipf-like law, the k-th largest
+    share weighing 1 / k ** skew, in random order.  A skew of 0 splits it
+    evenly.
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, n + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # Hand out what the rounding down left over, largest shares first
+    for i in range(total - sum(counts)):
+        counts[i % n] += 1
+    rng.shuffle(counts)
+    return counts
+
+
+class Command(BaseCommand):
+    help = ("Seeds the database with a large generated dataset, for benchmarks and query "
+            "plan checks.  Rows are added to existing data and inserted in batches, with "
+            "counters and highest bids precomputed.  Runs without prompting.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help="Number of users to create (default: 1000).",
+        )
+        parser.add_argument(
+            '--auctions',
+            type=int,
+            default=1000,
+            help="Number of auctions to create (default: 1000).",
+        )
+        parser.add_argument(
+            '--bids-per-auction',
+            type=float,
+            default=20,
+            help="Average number of bids per auction (default: 20).",
+        )
+        parser.add_argument(
+            '--likes-per-auction',
+            type=float,
+            default=5,
+            help="Average number of likes per auction, at most one per user (default: 5).",
+        )
+        parser.add_argument(
+            '--comments-per-auction',
+            type=float,
+            default=3,
+            help="Average number of comments per auction (default: 3).",
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help="Zipf exponent of the spread of bids, likes and comments over the "
+                 "auctions.  0 spreads them evenly, higher values make a few hot "
+                 "auctions take most of them (default: 1.0).",
+        )
+        parser.add_argument(
+            '--ended',
+            type=float,
+            default=0.1,
+            help="Fraction of the auctions that have ended and been closed (default: 0.1).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of users or auctions, with their rows, inserted per "
+                 "transaction (default: 1000).",
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help="Prefix of the usernames, which must not be taken yet (default: seed).",
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the random generator (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        auctions = options['auctions']
+        if users < 3:
+            raise CommandError("At least 3 users are needed, a seller and two bidders taking turns.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Usernames starting with {options['prefix']}- are taken.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        user_ids = self.create_users(users, options['prefix'])
+        self.stdout.write(f"Created {len(user_ids)} users.")
+
+        bid_counts = skewed_counts(
+            round(auctions * options['bids_per_auction']), auctions, options['skew'], self.rng)
+        like_counts = [
+            min(count, len(user_ids)) for count in skewed_counts(
+                round(auctions * options['likes_per_auction']), auctions,
+                options['skew'], self.rng)
+        ]
+        comment_counts = skewed_counts(
+            round(auctions * options['comments_per_auction']), auctions,
+            options['skew'], self.rng)
+
+        totals = {'auctions': 0, 'bids': 0, 'likes': 0, 'comments': 0}
+        for offset in range(0, auctions, self.batch_size):
+            end = min(offset + self.batch_size, auctions)
+            created = self.create_auctions(
+                user_ids, range(offset, end), options['ended'],
+                bid_counts[offset:end], like_counts[offset:end], comment_counts[offset:end])
+            for key, count in created.items():
+                totals[key] += count
+            self.stdout.write(f"Created {end} of {auctions} auctions.")
+
+        # bulk_create sends no signals, so invalidate the caches here
+        invalidate_auction_list()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {totals['auctions']} auctions, "
+            f"{totals['bids']} bids, {totals['likes']} likes and {totals['comments']} "
+            f"comments in {time.perf_counter() - start:.1f}s.  "
+            f"Every user's password is {PASSWORD!r}."))
+
+    def create_users(self, count, prefix):
+        # Hashing is slow by design, so every user shares one hash
+        password = make_password(PASSWORD)
+        user_ids = []
+        for offset in range(0, count, self.batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f'{prefix}-{i}',
+                        email=f'{prefix}-{i}@example.com',
+                        password=password,
+                    )
+                    for i in range(offset, min(offset + self.batch_size, count))
+                ])
+                # bulk_create sends no post_save, so add the profile every
+                # user gets from user.signals
+                UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def create_auctions(self, user_ids, numbers, ended, bid_counts, like_counts, comment_counts):
+        """
+        Creates a batch of auctions with their bids, likes and comments in
+        one transaction.  Returns the number of rows of each.
+        """
+        now = timezone.now()
+        auctions = []
+        bids = []
+        for number, bid_count, like_count, comment_count in zip(
+                numbers, bid_counts, like_counts, comment_counts):
+            seller_id = self.rng.choice(user_ids)
+            starting_price = Decimal(self.rng.randint(1, 500))
+            offset = timezone.timedelta(seconds=self.rng.randint(60, 30 * 86400))
+            is_active = self.rng.random() >= ended
+            auction = Auction(
+                seller_id=seller_id,
+                title=f'Auction {number}',
+                description=f'Description for auction {number}',
+                starting_price=starting_price,
+                end_time=now + offset if is_active else now - offset,
+                is_active=is_active,
+                bid_count=bid_count,
+                like_count=like_count,
+                comment_count=comment_count,
+            )
+            auction_bids = self.make_bids(user_ids, seller_id, starting_price, bid_count)
+            if auction_bids:
+                # The highest bid is inserted after its auction, which the
+                # deferred foreign key check allows within the transaction
+                highest = auction_bids[-1]
+                auction.highest_bid_id = highest.pk
+                auction.current_bid = highest.amount
+                auction.current_bidder_id = highest.bidder_id
+                if not is_active:
+                    auction.winner_id = highest.bidder_id
+            auctions.append(auction)
+            bids.append(auction_bids)
+
+        with transaction.atomic():
+            Auction.objects.bulk_create(auctions, batch_size=self.batch_size)
+
+            likes = []
+            comments = []
+            for auction, auction_bids in zip(auctions, bids):
+                for bid in auction_bids:
+                    bid.auction_id = auction.pk
+                likes.extend(
+                    Like(auction_id=auction.pk, user_id=user_id)
+                    for user_id in self.rng.sample(user_ids, auction.like_count)
+                )
+                comments.extend(
+                    Comment(
+                        auction_id=auction.pk,
+                        user_id=self.rng.choice(user_ids),
+                        comment_text=self.rng.choice(COMMENTS),
+                    )
+                    for _ in range(auction.comment_count)
+                )
+
+            bids = [bid for auction_bids in bids for bid in auction_bids]
+            Bid.objects.bulk_create(bids, batch_size=self.batch_size)
+            Like.objects.bulk_create(likes, batch_size=self.batch_size)
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+        return {
+            'auctions': len(auctions),
+            'bids': len(bids),
+            'likes': len(likes),
+            'comments': len(comments),
+        }
+
+    def make_bids(self, user_ids, seller_id, starting_price, count):
+        """
+        Returns count rising bids, none by the seller, and none by the
+        bidder already leading.
+        """
+        bids = []
+        bidder_id = None
+        amount = starting_price
+        for _ in range(count):
+            previous_id = bidder_id
+            while bidder_id in (seller_id, previous_id):
+                bidder_id = self.rng.choice(user_ids)
+            amount += BID_INCREMENT
+            bids.append(Bid(id=uuid.uuid4(), bidder_id=bidder_id, amount=amount))
+        return bids
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 02:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Auction = apps.get_model('auction', 'Auction')
+    Bid = apps.get_model('auction', 'Bid')
+    Like = apps.get_model('auction', 'Like')
+    Comment = apps.get_model('auction', 'Comment')
+
+    def count_of(model, **filters):
+        rows = model.objects.filter(auction=OuterRef('pk'), **filters) \
+            .order_by().values('auction').annotate(value=Count('pk')).values('value')
+        return Coalesce(Subquery(rows), 0)
+
+    Auction.objects.update(
+        bid_count=count_of(Bid),
+        like_count=count_of(Like),
+        comment_count=count_of(Comment, is_deleted=False),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0006_rename_bid_amount_bid_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='bid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='like_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 02:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0007_auction_bid_count_auction_comment_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['auction', 'created_at', 'id'], name='comment_live_by_auction_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 02:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_highest_bid(apps, schema_editor):
+    Auction = apps.get_model('auction', 'Auction')
+    Bid = apps.get_model('auction', 'Bid')
+
+    # current_bid was also written without a bid row, so rebuild it from bids
+    top = Bid.objects.filter(auction=OuterRef('pk')).order_by('-amount', 'created_at')
+    Auction.objects.update(
+        highest_bid=Subquery(top.values('pk')[:1]),
+        current_bid=Subquery(top.values('amount')[:1]),
+        current_bidder=Subquery(top.values('bidder')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0008_comment_comment_live_by_auction_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='current_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='highest_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auction.bid'),
+        ),
+        migrations.RunPython(backfill_highest_bid, migrations.RunPython.noop),
+    ]
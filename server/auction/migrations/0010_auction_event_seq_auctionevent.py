@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0009_auction_current_bidder_auction_highest_bid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='event_seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='AuctionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('type', models.CharField(max_length=32)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('auction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='auction.auction')),
+            ],
+            options={
+                'unique_together': {('auction', 'seq')},
+            },
+        ),
+    ]
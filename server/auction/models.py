@@ -1,9 +1,41 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 import uuid
 
 
+class AuctionQuerySet(models.QuerySet):
+    def with_summary(self):
+        """
+        Joins the seller, so a list of auctions can be serialized without
+        any per-row queries.  The highest bid and the counts are all read
+        from columns on the auction itself.
+        """
+        return self.select_related('seller')
+
+    def with_actual_counts(self):
+        """
+        Annotates each auction with actual_bid_count, actual_like_count and
+        actual_comment_count, counted from the related tables.  Used to
+        reconcile the counter columns.
+        """
+        bids = Bid.objects.filter(auction=OuterRef('pk')).order_by().values('auction')
+        likes = Like.objects.filter(auction=OuterRef('pk')).order_by().values('auction')
+        comments = Comment.objects.filter(
+            auction=OuterRef('pk'), is_deleted=False).order_by().values('auction')
+
+        return self.annotate(
+            actual_bid_count=Coalesce(Subquery(
+                bids.annotate(value=Count('pk')).values('value')), 0),
+            actual_like_count=Coalesce(Subquery(
+                likes.annotate(value=Count('pk')).values('value')), 0),
+            actual_comment_count=Coalesce(Subquery(
+                comments.annotate(value=Count('pk')).values('value')), 0),
+        )
+
+
 class Auction(models.Model):
     seller = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -13,28 +45,117 @@ class Auction(models.Model):
     current_bid = models.DecimalField(
         max_digits=10, decimal_places=2, blank=True, null=True
     )
+    # Projection of the highest bid, kept in step by Bid
+    current_bidder = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+'
+    )
+    highest_bid = models.ForeignKey(
+        'Bid', on_delete=models.SET_NULL, blank=True, null=True, related_name='+'
+    )
     end_time = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # The highest bidder when the auction closed (see auction.closing)
+    winner = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='won_auctions'
+    )
+    # Sequence number of the last AuctionEvent
+    event_seq = models.PositiveIntegerField(default=0)
+
+    # Denormalized counters, kept in step by Bid, Like and Comment
+    bid_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+
+    objects = AuctionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Back the keyset orderings of the auction list, with and
+            # without the is_active filter, and the closer's end time scan
+            models.Index(
+                fields=['is_active', 'end_time', 'id'],
+                name='auction_active_end_idx',
+            ),
+            models.Index(
+                fields=['is_active', 'created_at', 'id'],
+                name='auction_active_created_idx',
+            ),
+            models.Index(fields=['end_time', 'id'], name='auction_end_idx'),
+            models.Index(fields=['created_at', 'id'], name='auction_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def increment_counter(self, field, delta=1):
+        """
+        Atomically adds delta to one of the counter columns, and mirrors
+        the change on this instance.  Also moves updated_at, which with the
+        counters makes up the version of the auction.
+        """
+        now = timezone.now()
+        Auction.objects.filter(pk=self.pk).update(
+            updated_at=now, **{field: F(field) + delta})
+        setattr(self, field, getattr(self, field) + delta)
+        self.updated_at = now
+
+    def touch(self):
+        """
+        Moves updated_at, for changes to related rows that the counters do
+        not reflect.
+        """
+        self.updated_at = timezone.now()
+        Auction.objects.filter(pk=self.pk).update(updated_at=self.updated_at)
+
+    def record_bid(self, bid):
+        """
+        Counts a new bid, and makes it the highest bid if it beats the
+        current one, in a single atomic update.  The change is mirrored on
+        this instance.
+        """
+        now = timezone.now()
+        raised = Q(current_bid__isnull=True) | Q(current_bid__lt=bid.amount)
+        Auction.objects.filter(pk=self.pk).update(
+            bid_count=F('bid_count') + 1,
+            updated_at=now,
+            current_bid=Case(
+                When(raised, then=Value(bid.amount)),
+                default=F('current_bid'),
+                output_field=Auction._meta.get_field('current_bid'),
+            ),
+            current_bidder=Case(
+                When(raised, then=Value(bid.bidder_id)),
+                default=F('current_bidder'),
+                output_field=User._meta.pk,
+            ),
+            highest_bid=Case(
+                When(raised, then=Value(bid.pk)),
+                default=F('highest_bid'),
+                output_field=Bid._meta.get_field('id'),
+            ),
+        )
+
+        self.bid_count += 1
+        self.updated_at = now
+        if self.current_bid is None or self.current_bid < bid.amount:
+            self.current_bid = bid.amount
+            self.current_bidder_id = bid.bidder_id
+            self.highest_bid = bid
+
     def get_highest_bid(self):
         """
         Returns the highest bid for this auction.
         """
-        if self.bid_set.exists():
-            return self.bid_set.order_by('-amount').first()
-        return None
+        return self.highest_bid
 
     def can_cancel(self):
         """
         Determines if the auction can be canceled.
         Auctions can be canceled if they have no bids and the end time has not passed.
         """
-        return self.bid_set.count() == 0 and self.end_time > timezone.now()
+        return self.bid_count == 0 and self.end_time > timezone.now()
 
 
 class Bid(models.Model):
@@ -47,10 +168,26 @@ class Bid(models.Model):
     class Meta:
         unique_together = ('auction', 'bidder', 'amount')
         ordering = ['-created_at']
+        indexes = [
+            # The bids of an auction by amount, and newest first
+            models.Index(fields=['auction', '-amount'], name='bid_by_auction_amount_idx'),
+            models.Index(fields=['auction', '-created_at'], name='bid_by_auction_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.bidder.username} bid ${self.amount} on {self.auction.title}"
 
+    def save(self, *args, update_auction=True, **kwargs):
+        """
+        Records a new bid on its auction, unless the caller has already
+        updated the auction row (see auction.bidding.accept_bid).
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and update_auction:
+                self.auction.record_bid(self)
+
 
 class Like(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -64,6 +201,21 @@ class Like(models.Model):
     def __str__(self):
         return f"{self.user.username} liked {self.auction.title}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self.auction.increment_counter('like_count')
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic():
+            result = super().delete(using=using, keep_parents=keep_parents)
+            # A concurrent delete of the same like may have won the race
+            if result[0]:
+                self.auction.increment_counter('like_count', -1)
+        return result
+
 
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -78,12 +230,74 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)  # soft delete
 
+    class Meta:
+        indexes = [
+            # Backs the paginated listing of live comments for an auction
+            models.Index(
+                fields=['auction', 'created_at', 'id'],
+                condition=models.Q(is_deleted=False),
+                name='comment_live_by_auction_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} commented on {self.auction.title}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not adding:
+                self.auction.touch()
+            elif not self.is_deleted:
+                self.auction.increment_counter('comment_count')
+
     def delete(self, using=None, keep_parents=False):
         """
-        Soft delete the comment by setting is_deleted to True.
+        Soft delete the comment by setting is_deleted to True.  Only the
+        delete that flips the flag lowers the count, so concurrent deletes
+        of the same comment count once.
+        """
+        if self.is_deleted:
+            return
+        with transaction.atomic():
+            self.updated_at = timezone.now()
+            deleted = Comment.objects.filter(pk=self.pk, is_deleted=False).update(
+                is_deleted=True, updated_at=self.updated_at)
+            self.is_deleted = True
+            if deleted:
+                self.auction.increment_counter('comment_count', -1)
+                # update() sends no signal, so send the one save() would
+                models.signals.post_save.send(
+                    sender=Comment, instance=self, created=False,
+                    update_fields={'is_deleted', 'updated_at'}, raw=False,
+                    using=using or self._state.db)
+
+
+class AuctionEvent(models.Model):
+    """
+    An event broadcast to the sockets watching an auction, numbered by
+    Auction.event_seq.  Only the most recent events of each auction are
+    kept, for sockets that reconnect to catch up on (see auction.events).
+    """
+    auction = models.ForeignKey(
+        Auction,
+        on_delete=models.CASCADE,
+        related_name='events'
+    )
+    seq = models.PositiveIntegerField()
+    type = models.CharField(max_length=32)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('auction', 'seq')
+
+    def __str__(self):
+        return f"{self.type} #{self.seq} on {self.auction_id}"
+
+    def as_frame(self):
+        """
+        Returns the WebSocket frame of this event.
         """
-        self.is_deleted = True
-        self.save()
+        return {'type': self.type, 'seq': self.seq, **self.data}
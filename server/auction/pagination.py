@@ -0,0 +1,191 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite (key, id) ordering.
+
+    Each page is fetched with a range condition on the ordering key and the
+    primary key as tie breaker, so deep pages cost the same as the first one
+    no matter how many rows come before them.  Cursors are opaque, and carry
+    the ordering they were issued for.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    page_size = 25
+    max_page_size = 100
+
+    # Maps the accepted ordering values to the fields they sort on
+    orderings = {}
+    default_ordering = None
+
+    invalid_cursor_message = 'Invalid cursor.'
+    invalid_ordering_message = 'Invalid query parameter for ordering.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is None:
+            self.ordering = self.get_ordering(request)
+            position, reverse = None, False
+        else:
+            self.ordering, position, reverse = cursor
+
+        fields = self.orderings[self.ordering]
+        descending = self.ordering.startswith('-')
+        if reverse:
+            descending = not descending
+
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(fields, position, descending))
+
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(*[prefix + field for field in fields])
+
+        # Fetch one extra row to tell whether there is another page
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.fields = fields
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(
+            self.ordering_query_param, self.default_ordering)
+        if ordering not in self.orderings:
+            raise ValidationError(self.invalid_ordering_message)
+        return ordering
+
+    def get_position_filter(self, fields, position, descending):
+        """
+        Builds the row-value comparison (a, b) > (x, y) as
+        a > x OR (a = x AND b > y), which the database can answer with a
+        range scan on an index over the ordering fields.
+        """
+        lookup = 'lt' if descending else 'gt'
+        position_filter = Q()
+        equal = Q()
+        for field, value in zip(fields, position):
+            position_filter |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return position_filter
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        model = type(row)
+        position = [
+            model._meta.get_field(field).value_to_string(row)
+            for field in self.fields
+        ]
+        payload = json.dumps(
+            {'o': self.ordering, 'p': position, 'r': int(reverse)},
+            separators=(',', ':'),
+        )
+        cursor = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, self.ordering_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            ordering = payload['o']
+            fields = self.orderings[ordering]
+            if len(payload['p']) != len(fields):
+                raise ValueError
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, payload['p'])
+            ]
+            reverse = bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error,
+                DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, position, reverse
+
+
+class AuctionCursorPagination(KeysetPagination):
+    """
+    Paginates auctions by creation time (default) or by end time.
+    """
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('created_at', 'id'),
+        'end_time': ('end_time', 'id'),
+        '-end_time': ('end_time', 'id'),
+    }
+    default_ordering = 'created_at'
+
+
+class CommentCursorPagination(KeysetPagination):
+    """
+    Paginates the comments of an auction in the order they were posted.
+    """
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('created_at', 'id'),
+    }
+    default_ordering = 'created_at'
@@ -6,4 +6,8 @@ websocket_urlpatterns = [
         r'ws/auction/(?P<pk>\d+)/$',
         consumers.AuctionConsumer.as_asgi()
     ),
+    re_path(
+        r'ws/auctions/$',
+        consumers.AuctionSubscriptionConsumer.as_asgi()
+    ),
 ]
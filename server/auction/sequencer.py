@@ -0,0 +1,255 @@
+"""
+Optional sequenced bid placement for hot auctions.
+
+With AUCTION_BID_SEQUENCER['ENABLED'], bids are not applied by the request
+that received them.  They are put on a per-auction queue, and a single
+sequencer applies the queue of each auction in order, a batch per
+transaction, then hands each caller its accept/reject result.  Contention on
+the auction row becomes a sequential pipeline instead of a pile of waits for
+the row lock.
+
+Two queues are provided:
+
+- ChannelLayerBidQueue sends bids over the channel layer to a sequencer
+  worker.  Auctions are spread over SHARDS channels named
+  ``bid-sequencer-<n>``, and each is served by one worker process, e.g.
+  ``python manage.py runworker bid-sequencer-0``, so every auction has
+  exactly one sequencer.
+- InMemoryBidQueue runs the sequencer in the calling process.  It is the
+  stand-in for tests and single-process deployments.
+"""
+import asyncio
+from collections import deque
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from channels.consumer import AsyncConsumer
+from channels.layers import get_channel_layer
+from server.executors import BIDS, database_sync_to_async
+from .bidding import BidRejected, accept_bid
+from .broadcast import broadcast_event
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BACKEND': 'auction.sequencer.ChannelLayerBidQueue',
+    'SHARDS': 1,
+    'BATCH_SIZE': 50,
+    'TIMEOUT': 5,
+}
+
+
+def get_sequencer_settings():
+    return {**DEFAULTS, **getattr(settings, 'AUCTION_BID_SEQUENCER', {})}
+
+
+def bid_sequencer_enabled():
+    return get_sequencer_settings()['ENABLED']
+
+
+async def submit_bid(auction_id, bidder_id, amount):
+    """
+    Places a bid through the sequencer when it is enabled, or directly
+    through the accept path otherwise, and broadcasts it.  Returns the
+    serialized bid, or raises BidRejected or BidQueueTimeout.
+    """
+    if bid_sequencer_enabled():
+        return await get_bid_queue().submit(auction_id, bidder_id, amount)
+    results, frames = await database_sync_to_async(BidSequencer.apply_batch, pool=BIDS)(
+        auction_id, [(bidder_id, amount)])
+    if isinstance(results[0], BidRejected):
+        raise results[0]
+    await broadcast_event(auction_id, frames[0])
+    return results[0]
+
+
+class BidQueueTimeout(Exception):
+    """
+    Raised when the sequencer did not answer in time.  The bid may still be
+    applied later.
+    """
+
+
+class BidSequencer:
+    """
+    Applies the queued bids of each auction in order, in batches.
+
+    Each auction gets a drain task while it has queued bids.  The task
+    takes up to batch_size bids at a time and applies them one after the
+    other in a single transaction, so only one writer ever touches the
+    auction row, then broadcasts the accepted ones.  Must be used from a
+    single event loop.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or get_sequencer_settings()['BATCH_SIZE']
+        self.queues = {}
+        self.drains = {}
+
+    def enqueue(self, auction_id, bidder_id, amount):
+        """
+        Queues a bid and returns a future for its result: the serialized
+        bid, or a BidRejected exception.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(auction_id, deque()).append(
+            (bidder_id, amount, future))
+        if auction_id not in self.drains:
+            self.drains[auction_id] = asyncio.ensure_future(self.drain(auction_id))
+        return future
+
+    async def submit(self, auction_id, bidder_id, amount):
+        return await self.enqueue(auction_id, bidder_id, amount)
+
+    async def drain(self, auction_id):
+        queue = self.queues[auction_id]
+        try:
+            while queue:
+                batch = [queue.popleft()
+                         for _ in range(min(self.batch_size, len(queue)))]
+                try:
+                    results, frames = await database_sync_to_async(self.apply_batch, pool=BIDS)(
+                        auction_id, [(bidder_id, amount) for bidder_id, amount, _ in batch])
+                except Exception as e:
+                    results, frames = [e] * len(batch), []
+
+                for (_, _, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+                await asyncio.gather(*[
+                    broadcast_event(auction_id, frame) for frame in frames])
+        finally:
+            del self.drains[auction_id]
+            if not queue:
+                del self.queues[auction_id]
+
+    @staticmethod
+    def apply_batch(auction_id, bids):
+        """
+        Applies a batch of bids in order, in one transaction.  Returns the
+        serialized bid or the BidRejected of each one, and the event frames
+        of the accepted ones.
+        """
+        from .serializers import BidSerializer
+
+        results = []
+        frames = []
+        with transaction.atomic():
+            for bidder_id, amount in bids:
+                try:
+                    bid = accept_bid(auction_id, bidder_id, amount)
+                except BidRejected as e:
+                    results.append(e)
+                else:
+                    results.append(dict(BidSerializer(bid).data))
+                    frames.append(bid.event.as_frame())
+        return results, frames
+
+
+class InMemoryBidQueue:
+    """
+    Runs the sequencer in this process.
+    """
+
+    def __init__(self):
+        self.sequencer = BidSequencer()
+
+    async def submit(self, auction_id, bidder_id, amount):
+        timeout = get_sequencer_settings()['TIMEOUT']
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(self.sequencer.enqueue(auction_id, bidder_id, str(amount))),
+                timeout)
+        except asyncio.TimeoutError:
+            raise BidQueueTimeout()
+
+
+class ChannelLayerBidQueue:
+    """
+    Sends bids to the sequencer worker of their shard over the channel
+    layer, and waits for the result on a reply channel.
+    """
+
+    def __init__(self):
+        self.shards = get_sequencer_settings()['SHARDS']
+
+    def get_channel(self, auction_id):
+        return sequencer_channel(int(auction_id) % self.shards)
+
+    async def submit(self, auction_id, bidder_id, amount):
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        await channel_layer.send(self.get_channel(auction_id), {
+            'type': 'bid.submit',
+            'auction_id': auction_id,
+            'bidder_id': bidder_id,
+            'amount': str(amount),
+            'reply_channel': reply_channel,
+        })
+
+        timeout = get_sequencer_settings()['TIMEOUT']
+        try:
+            reply = await asyncio.wait_for(channel_layer.receive(reply_channel), timeout)
+        except asyncio.TimeoutError:
+            raise BidQueueTimeout()
+
+        if reply['accepted']:
+            return reply['bid']
+        raise BidRejected(reply['error'], reply['code'], reply['current_bid'])
+
+
+class BidSequencerConsumer(AsyncConsumer):
+    """
+    Channel worker that sequences the bids sent by ChannelLayerBidQueue.
+    """
+    # Shared by every message this worker process handles
+    sequencer = None
+
+    async def bid_submit(self, message):
+        if BidSequencerConsumer.sequencer is None:
+            BidSequencerConsumer.sequencer = BidSequencer()
+
+        # Queue synchronously to keep the order, and answer when applied
+        future = self.sequencer.enqueue(
+            message['auction_id'], message['bidder_id'], message['amount'])
+        asyncio.ensure_future(self.reply(future, message['reply_channel']))
+
+    async def reply(self, future, reply_channel):
+        try:
+            bid = await future
+        except BidRejected as e:
+            reply = {'accepted': False, **e.as_dict()}
+        except Exception as e:
+            reply = {'accepted': False, 'error': str(e), 'code': 'error', 'current_bid': None}
+        else:
+            reply = {'accepted': True, 'bid': bid}
+        await self.channel_layer.send(reply_channel, {'type': 'bid.result', **reply})
+
+
+def sequencer_channel(shard):
+    return f'bid-sequencer-{shard}'
+
+
+def sequencer_channels():
+    """
+    Returns the channel names routed to BidSequencerConsumer.
+    """
+    return [sequencer_channel(shard) for shard in range(get_sequencer_settings()['SHARDS'])]
+
+
+_bid_queues = {}
+
+
+def get_bid_queue():
+    """
+    Returns the configured bid queue, one instance per backend.
+    """
+    backend = get_sequencer_settings()['BACKEND']
+    if backend not in _bid_queues:
+        _bid_queues[backend] = import_string(backend)()
+    return _bid_queues[backend]
@@ -2,16 +2,18 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from server.timing import TimedSerializerMixin
+from .bidding import accept_bid
 from .models import Auction, Bid, Like, Comment
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username']
 
 
-class BidSerializer(serializers.ModelSerializer):
+class BidSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Bid
@@ -20,14 +22,13 @@ class BidSerializer(serializers.ModelSerializer):
 
     def validate_amount(self, value):
         auction = self.context['auction']
-        latest_bid_obj = auction.get_highest_bid()
 
-        if latest_bid_obj is None:
+        if auction.current_bid is None:
             if value <= auction.starting_price:
                 raise ValidationError(
                     'Bid must be higher than the starting price.')
         else:
-            if value <= latest_bid_obj.amount:
+            if value <= auction.current_bid:
                 raise ValidationError(
                     'Bid must be higher than the current highest bid.')
         return value
@@ -39,12 +40,11 @@ class BidSerializer(serializers.ModelSerializer):
 
     def validate_bidder(self, auction):
         user = self.context['request'].user
-        if auction.seller == user:
+        if auction.seller_id == user.pk:
             raise ValidationError('You cannot bid on your own auction.')
 
         # Check if the user is already the highest bidder
-        latest_bid_obj = auction.get_highest_bid()
-        if latest_bid_obj is not None and latest_bid_obj.bidder == user:
+        if auction.current_bidder_id == user.pk:
             raise ValidationError('You cannot outbid on yourself.')
         return auction
 
@@ -59,19 +59,17 @@ class BidSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
+        """
+        Places the bid through the atomic accept path.  The checks above
+        read an earlier copy of the auction, so the bid can still lose to a
+        concurrent one, which raises BidRejected.
+        """
         user = self.context['request'].user
         auction = self.context['auction']
+        return accept_bid(auction.pk, user.pk, validated_data['amount'])
 
-        validated_data['bidder'] = user
-        validated_data['auction'] = auction
-
-        auction.current_bid = validated_data['amount']
-        auction.save()
-
-        return Bid.objects.create(**validated_data)
 
-
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Like
@@ -93,7 +91,7 @@ class LikeSerializer(serializers.ModelSerializer):
         return Like.objects.create(**validated_data)
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(
         read_only=True, default=serializers.CurrentUserDefault())
     auction = serializers.PrimaryKeyRelatedField(
@@ -103,6 +101,7 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ['auction', 'user', 'comment_text',
                   'created_at', 'updated_at', 'is_deleted']
+        read_only_fields = ['created_at', 'updated_at', 'is_deleted']
 
     def validate(self, data):
         if self.partial:
@@ -121,14 +120,17 @@ class CommentSerializer(serializers.ModelSerializer):
         return Comment.objects.create(**validated_data)
 
 
-class AuctionListSerializer(serializers.ModelSerializer):
+class AuctionListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Expects a queryset built with Auction.objects.with_summary().
+    """
     seller = UserSerializer(read_only=True)
 
-    # Add fields
+    # Add fields (read from columns on the auction)
     highest_bid = serializers.SerializerMethodField()
-    bid_count = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
+    bid_count = serializers.IntegerField(read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Auction
@@ -138,22 +140,10 @@ class AuctionListSerializer(serializers.ModelSerializer):
                             'created_at', 'updated_at', 'bid_count', 'like_count', 'comment_count']
 
     def get_highest_bid(self, obj):
-        highest_bid = obj.get_highest_bid()
-        if highest_bid:
-            return highest_bid.amount
-        return None
-
-    def get_bid_count(self, obj):
-        return obj.bid_set.count()
-
-    def get_like_count(self, obj):
-        return obj.like_set.count()
-
-    def get_comment_count(self, obj):
-        return obj.comments.filter(is_deleted=False).count()
+        return obj.current_bid
 
 
-class AuctionDetailSerializer(serializers.ModelSerializer):
+class AuctionDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     seller = UserSerializer(read_only=True)
 
     # Add fields
@@ -175,22 +165,19 @@ class AuctionDetailSerializer(serializers.ModelSerializer):
                             'like_count', 'comment_count', 'user_has_liked', 'created_at', 'updated_at']
 
     def get_bids(self, obj):
-        return obj.bid_set.values_list('amount', flat=True).order_by('-amount')
+        return list(obj.bid_set.values_list('amount', flat=True).order_by('-amount'))
 
     def get_highest_bid(self, obj):
-        highest_bid = obj.get_highest_bid()
-        if highest_bid:
-            return highest_bid.amount
-        return None
+        return obj.current_bid
 
     def get_bid_count(self, obj):
-        return obj.bid_set.count()
+        return obj.bid_count
 
     def get_like_count(self, obj):
-        return obj.like_set.count()
+        return obj.like_count
 
     def get_comment_count(self, obj):
-        return obj.comments.count()
+        return obj.comment_count
 
     def get_user_has_liked(self, obj):
         user = self.context['request'].user
@@ -199,7 +186,7 @@ class AuctionDetailSerializer(serializers.ModelSerializer):
         return obj.like_set.filter(user=user).exists()
 
 
-class AuctionCreateSerializer(serializers.ModelSerializer):
+class AuctionCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for creating a new auction.
     """
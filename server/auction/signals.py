@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import invalidate_auction_list, invalidate_auction_snapshot
+from .models import Auction, Bid, Like, Comment
+
+
+@receiver(post_save, sender=Auction)
+@receiver(post_save, sender=Bid)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+def invalidate_cached_auction_list(sender, instance, **kwargs):
+    # Wait for the commit, so a concurrent read cannot cache the old state
+    transaction.on_commit(invalidate_auction_list)
+
+
+@receiver(post_save, sender=Auction)
+@receiver(post_save, sender=Bid)
+def invalidate_cached_auction_snapshot(sender, instance, **kwargs):
+    auction_id = instance.pk if sender is Auction else instance.auction_id
+    transaction.on_commit(lambda: invalidate_auction_snapshot(auction_id))
@@ -1,14 +1,70 @@
-from django.contrib.auth.models import User
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import ApplicationCommunicator, WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import AsyncRequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from prometheus_client import REGISTRY
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase, force_authenticate
-from .models import Auction, Bid, Like, Comment
-from .serializers import AuctionDetailSerializer
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, force_authenticate
+from server import executors
+from user.views import AsyncUserInfoView
+from .benchmark import ReadBenchmark
+from .bidding import BidRejected, accept_bid
+from .broadcast import BroadcastCoalescer, auction_group_name, broadcast_event, broadcast_event_sync
+from .cache import get_auction_snapshot
+from .closing import AuctionCloser, close_auctions
+from .events import get_missed_events
+from .loadtest import LoadTest, percentile
+from .management.commands.seed_scale import skewed_counts
+from .models import Auction, AuctionEvent, Bid, Like, Comment
+from .pagination import AuctionCursorPagination
+from .routing import websocket_urlpatterns
+from .sequencer import BidSequencer, BidSequencerConsumer, ChannelLayerBidQueue, submit_bid
+from .serializers import AuctionDetailSerializer, BidSerializer
+from .views.auction import (
+    AsyncAuctionDetailView,
+    AsyncAuctionListView,
+    AuctionDetailView,
+    AuctionListView,
+)
+from .views.comment import AsyncCommentListView, ManageCommentView
 import uuid
 
 
+# The tests run without Redis, and with every database call in the thread of
+# the test, inside its transaction
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+in_process = override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    EXECUTOR_POOLS={'ENABLED': False},
+)
+
+
+@override_settings(AUCTION_LIST_CACHE_TIMEOUT=0)
+@in_process
 class AuctionListViewTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -72,9 +128,9 @@ class AuctionListViewTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check that all 3 auctions are returned
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
-        auction_data = response.data[0]
+        auction_data = response.data['results'][0]
         self.assertIn('highest_bid', auction_data)
         self.assertIn('bid_count', auction_data)
         self.assertIn('like_count', auction_data)
@@ -84,7 +140,7 @@ class AuctionListViewTests(APITestCase):
         self.assertEqual(auction_data['like_count'], 2)
         self.assertEqual(auction_data['comment_count'], 0)
 
-        auction_data_no_bid = response.data[1]
+        auction_data_no_bid = response.data['results'][1]
         self.assertEqual(auction_data_no_bid['highest_bid'], None)
 
     def test_auction_list_active(self):
@@ -95,13 +151,13 @@ class AuctionListViewTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check that only 2 active auctions are returned
-        self.assertEqual(len(response.data), 2)
-        auction_titles = [auction['title'] for auction in response.data]
+        self.assertEqual(len(response.data['results']), 2)
+        auction_titles = [auction['title'] for auction in response.data['results']]
         self.assertIn('Active Auction 1', auction_titles)
         self.assertIn('Active Auction 3', auction_titles)
         self.assertNotIn('Inactive Auction 2', auction_titles)
 
-        auction_data = response.data[0]
+        auction_data = response.data['results'][0]
         self.assertIn('highest_bid', auction_data)
         self.assertIn('bid_count', auction_data)
         self.assertIn('like_count', auction_data)
@@ -119,10 +175,10 @@ class AuctionListViewTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check that only 1 inactive auction is returned
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Inactive Auction 2')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Inactive Auction 2')
 
-        auction_data = response.data[0]
+        auction_data = response.data['results'][0]
         self.assertIn('highest_bid', auction_data)
         self.assertIn('bid_count', auction_data)
         self.assertIn('like_count', auction_data)
@@ -151,9 +207,9 @@ class AuctionListViewTests(APITestCase):
         url = reverse('auction_list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
-        auction_data = response.data[0]
+        auction_data = response.data['results'][0]
         self.assertIn('highest_bid', auction_data)
         self.assertIn('bid_count', auction_data)
         self.assertIn('like_count', auction_data)
@@ -163,7 +219,97 @@ class AuctionListViewTests(APITestCase):
         self.assertEqual(auction_data['like_count'], 2)
         self.assertEqual(auction_data['comment_count'], 0)
 
+    def test_auction_list_query_count_constant(self):
+        """
+        Test that the number of queries does not grow with the number of auctions.
+        """
+        url = reverse('auction_list')
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        for i in range(10):
+            auction = Auction.objects.create(
+                seller=self.user3,
+                title=f'Extra Auction {i}',
+                starting_price=5.00,
+                end_time=timezone.now() + timezone.timedelta(days=3),
+            )
+            Bid.objects.create(
+                bidder=self.user1, auction=auction, amount=6.00)
+            Like.objects.create(user=self.user2, auction=auction)
+            Comment.objects.create(
+                user=self.user2, auction=auction, comment_text="Extra")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 13)
+        self.assertEqual(response.data['results'][-1]['highest_bid'], 6.00)
+        self.assertEqual(response.data['results'][-1]['bid_count'], 1)
+        self.assertEqual(response.data['results'][-1]['like_count'], 1)
+        self.assertEqual(response.data['results'][-1]['comment_count'], 1)
+
+    def test_auction_list_pagination(self):
+        """
+        Test that the cursor links walk the whole list forwards and back,
+        without repeating or skipping an auction.
+        """
+        for i in range(4):
+            Auction.objects.create(
+                seller=self.user3,
+                title=f'Extra Auction {i}',
+                starting_price=5.00,
+                end_time=self.auction1.end_time,
+            )
+
+        url = reverse('auction_list') + '?ordering=end_time&page_size=2'
+        seen = []
+        pages = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            pages.append(response.data)
+            seen += [auction['id'] for auction in response.data['results']]
+            url = response.data['next']
+
+        expected = list(Auction.objects.order_by(
+            'end_time', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[-2]['results'])
+
+    def test_auction_list_pagination_with_filter(self):
+        """
+        Test that the cursor links keep the is_active filter.
+        """
+        url = reverse('auction_list') + '?is_active=true&page_size=1'
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['title'], 'Active Auction 1')
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['title'], 'Active Auction 3')
+        self.assertIsNone(response.data['next'])
+
+    def test_auction_list_page_size_capped(self):
+        """
+        Test that page_size is capped and invalid cursors are rejected.
+        """
+        url = reverse('auction_list') + '?page_size=100000'
+        with mock.patch.object(AuctionCursorPagination, 'max_page_size', 2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(reverse('auction_list') + '?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(reverse('auction_list') + '?ordering=title')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
+@in_process
 class AuctionDetailViewTests(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -433,6 +579,7 @@ class AuctionCreateViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@in_process
 class AuctionCancelViewTests(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -504,6 +651,7 @@ class AuctionCancelViewTests(APITestCase):
         self.assertTrue(self.auction.is_active)
 
 
+@in_process
 class PlaceBidViewTests(APITestCase):
     def setUp(self):
         # Create a user (buyer)
@@ -794,6 +942,7 @@ class ManageLikeViewTests(APITestCase):
         self.assertIn('Method "PUT" not allowed.', response.data['detail'])
 
 
+@in_process
 class ManageCommentViewTests(APITestCase):
     """
     Test case specifically for managing comments (DELETE requests).
@@ -862,7 +1011,52 @@ class ManageCommentViewTests(APITestCase):
         response = self.client.get(self.base_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_get_comment_list_excludes_deleted(self):
+        """
+        Test that soft deleted comments are not listed.
+        """
+        self.comment1.delete()
+        response = self.client.get(self.base_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(
+            response.data['results'][0]['comment_text'],
+            'This is the second comment.'
+        )
+
+    def test_get_comment_list_paginated(self):
+        """
+        Test that comments are listed oldest first, one page at a time.
+        """
+        for i in range(3):
+            Comment.objects.create(
+                auction=self.auction,
+                user=self.user2,
+                comment_text=f"Extra comment {i}."
+            )
+
+        url = self.base_url + '?page_size=2'
+        texts = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            texts += [c['comment_text'] for c in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(texts, [
+            "This is the first comment.",
+            "This is the second comment.",
+            "Extra comment 0.",
+            "Extra comment 1.",
+            "Extra comment 2.",
+        ])
+
+        response = self.client.get(self.base_url + '?ordering=-created_at')
+        self.assertEqual(
+            response.data['results'][0]['comment_text'], "Extra comment 2.")
 
     def test_get_comment_by_comment_id(self):
         """
@@ -1080,3 +1274,2090 @@ class ManageCommentViewTests(APITestCase):
         response = self.client.delete(invalid_url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(Comment.objects.count(), 2)
+
+
+@in_process
+class AuctionCounterTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.user = User.objects.create_user(
+            username='buyer', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+
+    def test_bid_increments_bid_count(self):
+        """
+        Test that placing a bid increments the bid counter.
+        """
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+        response = self.client.post(url, {'amount': 20.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 1)
+        self.assertEqual(self.auction.current_bid, 20.00)
+
+    def test_like_and_unlike_update_like_count(self):
+        """
+        Test that liking and unliking keep the like counter in step.
+        """
+        url = reverse('manage_like', kwargs={'pk': self.auction.pk})
+        self.client.post(url)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.like_count, 1)
+
+        self.client.delete(url)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.like_count, 0)
+
+    def test_comment_create_and_soft_delete_update_comment_count(self):
+        """
+        Test that creating and soft deleting a comment keep the comment
+        counter in step, and that deleting twice only counts once.
+        """
+        url = reverse('manage_comment', kwargs={'pk': self.auction.pk})
+        self.client.post(url, {'comment_text': 'Nice!'})
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.comment_count, 1)
+
+        comment = Comment.objects.get(auction=self.auction)
+        comment_url = reverse(
+            'manage_comment_id',
+            kwargs={'pk': self.auction.pk, 'comment_id': comment.pk}
+        )
+        self.client.delete(comment_url)
+        comment.refresh_from_db()
+        comment.delete()
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.comment_count, 0)
+
+    def test_stale_deletes_count_once(self):
+        """
+        Test that two deletes of the same like or comment, each from its own
+        loaded copy, lower the counters once.
+        """
+        like = Like.objects.create(user=self.user, auction=self.auction)
+        comment = Comment.objects.create(
+            user=self.user, auction=self.auction, comment_text='Nice!')
+        for model, instance in ((Like, like), (Comment, comment)):
+            first = model.objects.get(pk=instance.pk)
+            second = model.objects.get(pk=instance.pk)
+            first.delete()
+            second.delete()
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.like_count, 0)
+        self.assertEqual(self.auction.comment_count, 0)
+        self.assertTrue(Comment.objects.get(pk=comment.pk).is_deleted)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """
+        Test that the reconcile_counters command repairs drifted counters.
+        """
+        Bid.objects.create(
+            bidder=self.user, auction=self.auction, amount=20.00)
+        Like.objects.create(user=self.user, auction=self.auction)
+        Auction.objects.filter(pk=self.auction.pk).update(
+            bid_count=5, like_count=0, comment_count=3)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 1', out.getvalue())
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 5)
+
+        call_command('reconcile_counters', '--chunk-size', '1', stdout=out)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 1)
+        self.assertEqual(self.auction.like_count, 1)
+        self.assertEqual(self.auction.comment_count, 0)
+
+
+@in_process
+class AuctionListCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.seller_token = Token.objects.create(user=self.seller)
+        self.user = User.objects.create_user(
+            username='buyer', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+        self.url = reverse('auction_list')
+        # Reads go through an anonymous client, writes through self.client
+        self.reader = self.client_class()
+
+    def assertServedFromCache(self, url):
+        with self.assertNumQueries(0):
+            response = self.reader.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_is_cached_per_query(self):
+        """
+        Test that a repeated list request is served from the cache, and that
+        differently filtered requests are cached separately.
+        """
+        with self.assertNumQueries(1):
+            response = self.reader.get(self.url)
+        self.assertEqual(len(response.data['results']), 1)
+        cached = self.assertServedFromCache(self.url)
+        self.assertEqual(cached.data, response.data)
+
+        # The filter value is normalized
+        with self.assertNumQueries(1):
+            self.reader.get(self.url + '?is_active=true')
+        self.assertServedFromCache(self.url + '?is_active=TRUE')
+
+        with self.assertNumQueries(1):
+            response = self.reader.get(self.url + '?is_active=false')
+        self.assertEqual(len(response.data['results']), 0)
+
+    def test_invalid_query_is_not_cached(self):
+        """
+        Test that invalid filters still fail rather than being cached.
+        """
+        response = self.reader.get(self.url + '?is_active=invalid')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_invalidate_cached_list(self):
+        """
+        Test that bids, likes, comments, new auctions and cancellations
+        invalidate the cached list.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        def assertRefreshed(field, value):
+            with self.assertNumQueries(1):
+                response = self.reader.get(self.url)
+            self.assertEqual(response.data['results'][0][field], value)
+            self.assertServedFromCache(self.url)
+
+        self.reader.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('place_bid', kwargs={'pk': self.auction.pk}),
+                {'amount': 20.00}, format='json')
+        assertRefreshed('bid_count', 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('manage_like', kwargs={'pk': self.auction.pk}))
+        assertRefreshed('like_count', 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('manage_like', kwargs={'pk': self.auction.pk}))
+        assertRefreshed('like_count', 0)
+
+        comment_url = reverse('manage_comment', kwargs={'pk': self.auction.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(comment_url, {'comment_text': 'Nice!'})
+        assertRefreshed('comment_count', 1)
+
+        comment = Comment.objects.get(auction=self.auction)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse(
+                'manage_comment_id',
+                kwargs={'pk': self.auction.pk, 'comment_id': comment.pk}
+            ))
+        assertRefreshed('comment_count', 0)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.seller_token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('auction_create'), {
+                'title': 'Second Auction',
+                'starting_price': 5.00,
+                'end_time': (timezone.now() + timezone.timedelta(days=1)).isoformat(),
+            }, format='json')
+        with self.assertNumQueries(1):
+            response = self.reader.get(self.url)
+        self.assertEqual(len(response.data['results']), 2)
+
+        second = Auction.objects.get(title='Second Auction')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('auction_cancel', kwargs={'pk': second.pk}))
+        with self.assertNumQueries(1):
+            response = self.reader.get(self.url + '?is_active=false')
+        self.assertEqual(len(response.data['results']), 1)
+
+
+@in_process
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.user = User.objects.create_user(
+            username='buyer', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+        self.detail_url = reverse('auction_detail', kwargs={'pk': self.auction.pk})
+        self.list_url = reverse('auction_list')
+
+    def test_detail_not_modified(self):
+        """
+        Test that the detail endpoint answers a matching If-None-Match with
+        304, without serializing the auction.
+        """
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        with mock.patch.object(AuctionDetailSerializer, 'to_representation') as to_representation:
+            with self.assertNumQueries(1):
+                response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+            to_representation.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail_etag_changes_with_activity(self):
+        """
+        Test that bids, likes, comments and comment edits change the ETag.
+        """
+        etags = {self.client.get(self.detail_url)['ETag']}
+
+        Bid.objects.create(bidder=self.user, auction=self.auction, amount=20.00)
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        Like.objects.create(user=self.user, auction=self.auction)
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        comment = Comment.objects.create(
+            user=self.user, auction=self.auction, comment_text='First')
+        etags.add(self.client.get(self.detail_url)['ETag'])
+
+        comment.comment_text = 'Edited'
+        comment.save()
+        response = self.client.get(self.detail_url)
+        etags.add(response['ETag'])
+        self.assertEqual(len(etags), 5)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_is_per_user(self):
+        """
+        Test that authenticated users get their own, private ETag.
+        """
+        anonymous = self.client.get(self.detail_url)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.get(self.detail_url)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_not_modified(self):
+        """
+        Test that the list endpoint answers a matching If-None-Match with
+        304, and that writes change its ETag.
+        """
+        response = self.client.get(self.list_url)
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(
+            self.list_url + '?is_active=false', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Bid.objects.create(bidder=self.user, auction=self.auction, amount=20.00)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@in_process
+class HighestBidProjectionTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.user = User.objects.create_user(
+            username='buyer', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+        self.url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+
+    def test_accepted_bid_updates_projection(self):
+        """
+        Test that an accepted bid becomes the auction's highest bid.
+        """
+        response = self.client.post(self.url, {'amount': 20.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.auction.refresh_from_db()
+        bid = Bid.objects.get(auction=self.auction)
+        self.assertEqual(self.auction.current_bid, 20.00)
+        self.assertEqual(self.auction.current_bidder, self.user)
+        self.assertEqual(self.auction.highest_bid, bid)
+        self.assertEqual(self.auction.get_highest_bid(), bid)
+
+    def test_lower_bid_does_not_replace_projection(self):
+        """
+        Test that recording a lower bid counts it, but keeps the highest bid.
+        """
+        high = Bid.objects.create(
+            bidder=self.bidder, auction=self.auction, amount=30.00)
+        Bid.objects.create(
+            bidder=self.user, auction=self.auction, amount=25.00)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 2)
+        self.assertEqual(self.auction.current_bid, 30.00)
+        self.assertEqual(self.auction.current_bidder, self.bidder)
+        self.assertEqual(self.auction.highest_bid, high)
+
+    def test_bid_validation_does_not_scan_bids(self):
+        """
+        Test that validating and placing a bid reads the projection instead
+        of sorting the bids of the auction.
+        """
+        Bid.objects.create(
+            bidder=self.bidder, auction=self.auction, amount=30.00)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'amount': 40.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for query in queries.captured_queries:
+            self.assertFalse(
+                query['sql'].startswith('SELECT') and 'auction_bid' in query['sql'],
+                query['sql'])
+
+
+@in_process
+class ConcurrentBidTests(TransactionTestCase):
+    """
+    Hammers one auction with bids from many threads at once.
+    """
+    threads = 8
+    bids_per_thread = 10
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidders = [
+            User.objects.create_user(username=f'bidder{i}', password='password')
+            for i in range(self.threads)
+        ]
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Hot Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def test_concurrent_bids_are_serialized(self):
+        """
+        Test that concurrent bids never let a lower bid win, that every
+        accepted bid is recorded exactly once, and that losers are told they
+        were outbid.
+        """
+        barrier = threading.Barrier(self.threads)
+        accepted = []
+        rejected = []
+        errors = []
+
+        def hammer(index):
+            bidder = self.bidders[index]
+            barrier.wait()
+            try:
+                for round in range(self.bids_per_thread):
+                    # Every thread bids the same ladder of amounts
+                    amount = Decimal(11 + round)
+                    while True:
+                        try:
+                            accept_bid(self.auction.pk, bidder.pk, amount)
+                            accepted.append(amount)
+                        except BidRejected as e:
+                            rejected.append(e.code)
+                        except OperationalError:
+                            # The in-memory SQLite test database reports a
+                            # locked table instead of waiting, so retry
+                            time.sleep(0.001)
+                            continue
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=hammer, args=(i,)) for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(accepted)
+        # Only outbid and self-outbid rejections are possible here
+        self.assertLessEqual(
+            set(rejected), {BidRejected.OUTBID, BidRejected.OWN_BID})
+        self.assertEqual(
+            len(accepted) + len(rejected), self.threads * self.bids_per_thread)
+
+        # Each amount of the ladder was accepted at most once
+        self.assertEqual(len(accepted), len(set(accepted)))
+
+        self.auction.refresh_from_db()
+        bids = Bid.objects.filter(auction=self.auction)
+        self.assertEqual(self.auction.bid_count, bids.count())
+        self.assertEqual(self.auction.bid_count, len(accepted))
+        top = bids.order_by('-amount').first()
+        self.assertEqual(self.auction.current_bid, max(accepted))
+        self.assertEqual(self.auction.highest_bid, top)
+        self.assertEqual(self.auction.current_bidder, top.bidder)
+
+        # Bids were accepted in strictly increasing order
+        amounts = list(bids.order_by('created_at').values_list('amount', flat=True))
+        self.assertEqual(amounts, sorted(amounts))
+
+    def test_outbid_bid_is_a_conflict(self):
+        """
+        Test that a bid that loses the race is answered with 409.
+        """
+        client = APIClient()
+        client.force_authenticate(self.bidders[0])
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+
+        # A concurrent bid lands between validation and the accept path
+        original = BidSerializer.validate
+
+        def validate_then_lose(serializer, data):
+            data = original(serializer, data)
+            accept_bid(self.auction.pk, self.bidders[1].pk, Decimal('50.00'))
+            return data
+
+        with mock.patch.object(BidSerializer, 'validate', validate_then_lose):
+            response = client.post(url, {'amount': 20.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['code'], BidRejected.OUTBID)
+        self.assertEqual(Decimal(response.data['current_bid']), Decimal('50.00'))
+        self.assertEqual(Bid.objects.count(), 1)
+
+
+@override_settings(AUCTION_BID_SEQUENCER={
+    'ENABLED': True,
+    'BACKEND': 'auction.sequencer.InMemoryBidQueue',
+})
+@in_process
+class BidSequencerTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidders = [
+            User.objects.create_user(username=f'bidder{i}', password='password')
+            for i in range(4)
+        ]
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Hot Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def test_place_bid_through_sequencer(self):
+        """
+        Test that place_bid hands the bid to the sequencer when enabled.
+        """
+        client = APIClient()
+        client.force_authenticate(self.bidders[0])
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+        with mock.patch.object(
+                BidSequencer, 'apply_batch', wraps=BidSequencer.apply_batch) as apply_batch:
+            response = client.post(url, {'amount': 20.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(response.data['amount']), Decimal('20.00'))
+        apply_batch.assert_called_once()
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, Decimal('20.00'))
+        self.assertEqual(self.auction.current_bidder, self.bidders[0])
+
+    def test_burst_is_applied_in_order_in_batches(self):
+        """
+        Test that a burst of queued bids is applied in arrival order, in
+        batches, and that each caller gets its own result.
+        """
+        sequencer = BidSequencer(batch_size=2)
+        burst = [
+            (self.bidders[0].pk, '20.00'),
+            (self.bidders[1].pk, '30.00'),
+            (self.bidders[2].pk, '25.00'),  # outbid by the bid before it
+            (self.bidders[3].pk, '40.00'),
+            (self.bidders[3].pk, '50.00'),  # already the highest bidder
+        ]
+
+        async def submit_burst():
+            futures = [
+                sequencer.enqueue(self.auction.pk, bidder_id, amount)
+                for bidder_id, amount in burst
+            ]
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+        with mock.patch.object(
+                BidSequencer, 'apply_batch', wraps=BidSequencer.apply_batch) as apply_batch:
+            results = async_to_sync(submit_burst)()
+        self.assertEqual(
+            [len(call.args[1]) for call in apply_batch.call_args_list], [2, 2, 1])
+
+        self.assertEqual(Decimal(results[0]['amount']), Decimal('20.00'))
+        self.assertEqual(Decimal(results[1]['amount']), Decimal('30.00'))
+        self.assertIsInstance(results[2], BidRejected)
+        self.assertEqual(results[2].code, BidRejected.OUTBID)
+        self.assertEqual(Decimal(results[3]['amount']), Decimal('40.00'))
+        self.assertIsInstance(results[4], BidRejected)
+        self.assertEqual(results[4].code, BidRejected.OWN_BID)
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 3)
+        self.assertEqual(self.auction.current_bid, Decimal('40.00'))
+        self.assertEqual(sequencer.queues, {})
+        self.assertEqual(sequencer.drains, {})
+
+    def test_channel_layer_queue_round_trip(self):
+        """
+        Test that the channel layer queue reaches the sequencer worker and
+        returns its result.
+        """
+        async def round_trip():
+            worker = ApplicationCommunicator(
+                BidSequencerConsumer.as_asgi(),
+                {'type': 'channel', 'channel': 'bid-sequencer-0'},
+            )
+            channel_layer = get_channel_layer()
+            queue = ChannelLayerBidQueue()
+
+            async def serve():
+                message = await channel_layer.receive('bid-sequencer-0')
+                await worker.send_input(message)
+
+            server = asyncio.ensure_future(serve())
+            try:
+                return await queue.submit(self.auction.pk, self.bidders[0].pk, '20.00')
+            finally:
+                await server
+                await worker.wait(0.1)
+
+        with override_settings(CHANNEL_LAYERS={
+            'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+        }):
+            bid = async_to_sync(round_trip)()
+        self.assertEqual(Decimal(bid['amount']), Decimal('20.00'))
+        self.assertEqual(Bid.objects.get(auction=self.auction).bidder, self.bidders[0])
+
+
+@in_process
+class AuctionConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+        self.watcher = User.objects.create_user(
+            username='watcher', password='watcherpassword')
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Live Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def get_communicator(self, user=None):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/auction/{self.auction.pk}/')
+        communicator.scope['user'] = user or AnonymousUser()
+        return communicator
+
+    async def connect(self, user=None):
+        communicator = self.get_communicator(user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        initial = await communicator.receive_json_from()
+        self.assertEqual(initial['type'], 'initial_data')
+        return communicator
+
+    def test_initial_data(self):
+        """
+        Test that a new socket gets a JSON snapshot of the auction.
+        """
+        async def run():
+            communicator = self.get_communicator()
+            await communicator.connect()
+            initial = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return initial
+
+        initial = async_to_sync(run)()
+        self.assertEqual(initial['data']['id'], self.auction.pk)
+        self.assertEqual(initial['data']['seller'], self.seller.pk)
+        self.assertEqual(Decimal(initial['data']['starting_price']), Decimal('10.00'))
+
+    def test_bid_is_acked_and_broadcast(self):
+        """
+        Test that a bid over the socket is acked to the sender and sent to
+        every watcher as a bid_update.
+        """
+        async def run():
+            sender = await self.connect(self.bidder)
+            watcher = await self.connect(self.watcher)
+            await sender.send_json_to(
+                {'type': 'bid', 'ref': 'r1', 'bid': {'amount': '20.00'}})
+            ack = await sender.receive_json_from(timeout=5)
+            sender_update = await sender.receive_json_from(timeout=5)
+            watcher_update = await watcher.receive_json_from(timeout=5)
+            await sender.disconnect()
+            await watcher.disconnect()
+            return ack, sender_update, watcher_update
+
+        ack, sender_update, watcher_update = async_to_sync(run)()
+        self.assertEqual(ack['type'], 'bid_ack')
+        self.assertEqual(ack['ref'], 'r1')
+        self.assertEqual(Decimal(ack['bid']['amount']), Decimal('20.00'))
+        self.assertEqual(sender_update, watcher_update)
+        self.assertEqual(watcher_update['type'], 'bid_update')
+        self.assertEqual(watcher_update['bid']['bidder']['username'], 'bidder')
+        self.assertEqual(Decimal(watcher_update['bid']['current_bid']), Decimal('20.00'))
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, Decimal('20.00'))
+        self.assertEqual(self.auction.current_bidder, self.bidder)
+        self.assertEqual(self.auction.bid_count, 1)
+
+    def test_rejected_bids_are_nacked(self):
+        """
+        Test that anonymous, invalid and losing bids are nacked and not
+        broadcast.
+        """
+        Bid.objects.create(auction=self.auction, bidder=self.watcher, amount=30.00)
+
+        async def run():
+            anonymous = await self.connect()
+            sender = await self.connect(self.bidder)
+            frames = []
+            await anonymous.send_json_to({'type': 'bid', 'bid': {'amount': '50.00'}})
+            frames.append(await anonymous.receive_json_from())
+            await sender.send_json_to({'type': 'bid', 'bid': {'amount': 'lots'}})
+            frames.append(await sender.receive_json_from())
+            await sender.send_json_to({'type': 'bid', 'ref': 7, 'bid': {'amount': '25.00'}})
+            frames.append(await sender.receive_json_from(timeout=5))
+            self.assertTrue(await anonymous.receive_nothing())
+            self.assertTrue(await sender.receive_nothing())
+            await anonymous.disconnect()
+            await sender.disconnect()
+            return frames
+
+        unauthenticated, invalid, outbid = async_to_sync(run)()
+        self.assertEqual(unauthenticated['type'], 'bid_nack')
+        self.assertEqual(unauthenticated['code'], 'not_authenticated')
+        self.assertEqual(invalid['code'], 'invalid')
+        self.assertEqual(outbid['ref'], 7)
+        self.assertEqual(outbid['code'], BidRejected.OUTBID)
+        self.assertEqual(Decimal(outbid['current_bid']), Decimal('30.00'))
+        self.assertEqual(Bid.objects.filter(auction=self.auction).count(), 1)
+
+    def test_invalid_messages(self):
+        """
+        Test that a message that is not a JSON object is answered with an
+        error frame, and the socket stays open.
+        """
+        async def run():
+            communicator = await self.connect(self.bidder)
+            replies = []
+            for text in ('not json', '[]', '1', '"bid"', 'null'):
+                await communicator.send_to(text_data=text)
+                replies.append(await communicator.receive_json_from())
+            await communicator.send_json_to({'type': 'bid', 'ref': 1, 'bid': {'amount': '20.00'}})
+            ack = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return replies, ack
+
+        replies, ack = async_to_sync(run)()
+        self.assertEqual(replies, [{'type': 'error', 'error': 'Invalid JSON.'}] * 5)
+        self.assertEqual(ack['type'], 'bid_ack')
+
+    def test_reconnect_replays_missed_events(self):
+        """
+        Test that a socket reconnecting with since is sent only the events
+        it missed, and then the live ones without repeats.
+        """
+        for amount in (20, 30):
+            accept_bid(self.auction.pk, [self.bidder, self.watcher][amount // 10 % 2].pk, amount)
+
+        async def run():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns),
+                f'/ws/auction/{self.auction.pk}/?since=1')
+            communicator.scope['user'] = self.bidder
+            await communicator.connect()
+            replayed = await communicator.receive_json_from()
+            self.assertTrue(await communicator.receive_nothing())
+
+            # Already sent by the replay
+            await get_channel_layer().group_send(
+                auction_group_name(self.auction.pk),
+                {'type': 'send_event', 'event': replayed})
+            await communicator.send_json_to({'type': 'bid', 'bid': {'amount': '40.00'}})
+            frames = [await communicator.receive_json_from(timeout=5) for _ in range(2)]
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return replayed, frames
+
+        replayed, frames = async_to_sync(run)()
+        self.assertEqual(replayed['type'], 'bid_update')
+        self.assertEqual(replayed['seq'], 2)
+        self.assertEqual(replayed['bid']['amount'], '30.00')
+        self.assertEqual([frame['type'] for frame in frames], ['bid_ack', 'bid_update'])
+        self.assertEqual(frames[1]['seq'], 3)
+        self.assertEqual(frames[1]['bid']['amount'], '40.00')
+
+    @override_settings(AUCTION_EVENT_BUFFER_SIZE=1)
+    def test_reconnect_after_large_gap_gets_snapshot(self):
+        """
+        Test that a socket that missed more than the buffer holds is sent a
+        snapshot instead.
+        """
+        for amount in (20, 30):
+            accept_bid(self.auction.pk, [self.bidder, self.watcher][amount // 10 % 2].pk, amount)
+
+        async def run():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns),
+                f'/ws/auction/{self.auction.pk}/?since=0')
+            communicator.scope['user'] = AnonymousUser()
+            await communicator.connect()
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(run)()
+        self.assertEqual(frame['type'], 'initial_data')
+        self.assertEqual(frame['data']['seq'], 2)
+        self.assertEqual(frame['data']['current_bid'], '30.00')
+
+    def test_http_bid_is_broadcast(self):
+        """
+        Test that a bid placed through place_bid reaches the sockets.
+        """
+        client = APIClient()
+        client.force_authenticate(self.bidder)
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+
+        async def run():
+            watcher = await self.connect()
+            response = await database_sync_to_async(client.post)(
+                url, {'amount': 20.00}, format='json')
+            update = await watcher.receive_json_from(timeout=5)
+            await watcher.disconnect()
+            return response, update
+
+        response, update = async_to_sync(run)()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(update['type'], 'bid_update')
+        self.assertEqual(update['bid']['id'], str(response.data['id']))
+        self.assertEqual(update['bid']['bidder']['id'], self.bidder.pk)
+
+
+@in_process
+class BroadcastCoalescingTests(APITestCase):
+    def setUp(self):
+        self.coalescer = BroadcastCoalescer()
+        patcher = mock.patch('auction.broadcast.coalescer', self.coalescer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def broadcast_burst(self, amounts):
+        """
+        Broadcasts a bid_update for each amount at once, and returns the
+        frames received by a watcher of the auction.
+        """
+        async def run():
+            channel_layer = get_channel_layer()
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(auction_group_name(1), channel)
+            await asyncio.gather(*[
+                broadcast_event(1, {
+                    'type': 'bid_update',
+                    'seq': seq,
+                    'bid': {'amount': amount, 'current_bid': amount, 'bid_count_delta': 1},
+                })
+                for seq, amount in enumerate(amounts, 1)
+            ])
+            frames = []
+            while True:
+                try:
+                    message = await asyncio.wait_for(channel_layer.receive(channel), 0.1)
+                except asyncio.TimeoutError:
+                    return frames
+                frames.append(message['event'])
+
+        return async_to_sync(run)()
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=50)
+    def test_burst_is_coalesced(self):
+        """
+        Test that a burst within the window is sent as one update with the
+        highest bid and the number of bids it stands for.
+        """
+        frames = self.broadcast_burst(['20.00', '30.00', '25.00', '40.00'])
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0]['seq'], 4)
+        self.assertEqual(frames[0]['bid']['amount'], '40.00')
+        self.assertEqual(frames[0]['bid']['current_bid'], '40.00')
+        self.assertEqual(frames[0]['bid']['bid_count_delta'], 4)
+        self.assertEqual(self.coalescer.stats(), {'received': 4, 'sent': 1, 'saved': 3})
+        self.assertEqual(self.coalescer.pending, {})
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=0)
+    def test_no_window_sends_every_bid(self):
+        """
+        Test that every bid is sent when coalescing is off.
+        """
+        frames = self.broadcast_burst(['20.00', '30.00'])
+        self.assertEqual([frame['bid']['amount'] for frame in frames], ['20.00', '30.00'])
+        self.assertEqual([frame['bid']['bid_count_delta'] for frame in frames], [1, 1])
+        self.assertEqual(self.coalescer.stats(), {'received': 2, 'sent': 2, 'saved': 0})
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=200)
+    def test_pending_bid_is_sent_before_close(self):
+        """
+        Test that a close or cancel within the window sends the pending bid
+        update first, so that sockets do not drop it as already seen.
+        """
+        for event_type in ('auction_closed', 'auction_cancelled'):
+            with self.subTest(event_type=event_type):
+                async def run():
+                    channel_layer = get_channel_layer()
+                    channel = await channel_layer.new_channel()
+                    await channel_layer.group_add(auction_group_name(1), channel)
+                    await broadcast_event(1, {
+                        'type': 'bid_update',
+                        'seq': 1,
+                        'bid': {'amount': '20.00', 'current_bid': '20.00', 'bid_count_delta': 1},
+                    })
+                    await broadcast_event(1, {'type': event_type, 'seq': 2})
+                    frames = []
+                    for _ in range(2):
+                        message = await asyncio.wait_for(channel_layer.receive(channel), 0.1)
+                        frames.append(message['event'])
+                    await channel_layer.group_discard(auction_group_name(1), channel)
+                    return frames
+
+                frames = async_to_sync(run)()
+                self.assertEqual([frame['type'] for frame in frames], ['bid_update', event_type])
+                self.assertEqual([frame['seq'] for frame in frames], [1, 2])
+                self.assertEqual(self.coalescer.pending, {})
+                self.assertEqual(self.coalescer.timers, {})
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=200)
+    def test_send_does_not_wait_for_window(self):
+        """
+        Test that the caller opening a window returns at once, and the flush
+        sends the frame when the window closes.
+        """
+        async def run():
+            channel_layer = get_channel_layer()
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(auction_group_name(1), channel)
+            start = time.perf_counter()
+            await broadcast_event(1, {
+                'type': 'bid_update',
+                'seq': 1,
+                'bid': {'amount': '20.00', 'current_bid': '20.00', 'bid_count_delta': 1},
+            })
+            returned = time.perf_counter() - start
+            message = await asyncio.wait_for(channel_layer.receive(channel), 1)
+            return returned, message['event']
+
+        returned, frame = async_to_sync(run)()
+        self.assertLess(returned, 0.1)
+        self.assertEqual(frame['seq'], 1)
+        self.assertEqual(self.coalescer.pending, {})
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=200)
+    def test_sync_caller_without_loop_sends(self):
+        """
+        Test that a sync caller without an outer event loop sends its frame
+        before returning, rather than losing it with the loop.
+        """
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(auction_group_name(1), channel)
+        broadcast_event_sync(1, {
+            'type': 'bid_update',
+            'seq': 1,
+            'bid': {'amount': '20.00', 'current_bid': '20.00', 'bid_count_delta': 1},
+        })
+        self.assertEqual(self.coalescer.pending, {})
+        self.assertEqual(self.coalescer.stats(), {'received': 1, 'sent': 1, 'saved': 0})
+
+    @override_settings(AUCTION_BROADCAST_COALESCE_MS=50)
+    def test_counts_are_exported(self):
+        """
+        Test that the frames received, sent and saved are exported as
+        counters.
+        """
+        before = {outcome: sample('auction_broadcast_frames_total', outcome=outcome)
+                  for outcome in ('received', 'sent', 'saved')}
+        self.broadcast_burst(['20.00', '30.00', '25.00'])
+        self.assertEqual(
+            {outcome: sample('auction_broadcast_frames_total', outcome=outcome) - count
+             for outcome, count in before.items()},
+            {'received': 3, 'sent': 1, 'saved': 2})
+
+
+@in_process
+class AuctionSnapshotCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+
+    def test_snapshot_is_json_safe_and_shared(self):
+        """
+        Test that the snapshot is JSON-safe and read from the database once.
+        """
+        with self.assertNumQueries(1):
+            snapshot = get_auction_snapshot(self.auction.pk)
+        self.assertEqual(json.loads(json.dumps(snapshot)), snapshot)
+        self.assertEqual(snapshot['seller'], self.seller.pk)
+        self.assertEqual(snapshot['starting_price'], '10.00')
+        self.assertIsNone(snapshot['current_bid'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_auction_snapshot(self.auction.pk), snapshot)
+
+    def test_missing_auction(self):
+        """
+        Test that a missing auction has no snapshot, and is not read again.
+        """
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_auction_snapshot(0))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_auction_snapshot(0))
+
+    def test_bid_invalidates_snapshot(self):
+        """
+        Test that a bid is reflected in the next snapshot.
+        """
+        get_auction_snapshot(self.auction.pk)
+        self.client.force_authenticate(self.bidder)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('place_bid', kwargs={'pk': self.auction.pk}),
+                {'amount': 20.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        snapshot = get_auction_snapshot(self.auction.pk)
+        self.assertEqual(snapshot['current_bid'], '20.00')
+        self.assertEqual(snapshot['current_bidder'], self.bidder.pk)
+        self.assertEqual(snapshot['bid_count'], 1)
+
+    def test_cancel_invalidates_snapshot(self):
+        """
+        Test that a cancel is reflected in the next snapshot.
+        """
+        get_auction_snapshot(self.auction.pk)
+        self.client.force_authenticate(self.seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('auction_cancel', kwargs={'pk': self.auction.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(get_auction_snapshot(self.auction.pk)['is_active'])
+
+    def test_single_flight(self):
+        """
+        Test that a caller waits for the snapshot being built by another
+        instead of reading the database.
+        """
+        key = f'auction:{self.auction.pk}:snapshot:v1'
+        cache.add(f'{key}:lock', 1)
+        built = {'id': self.auction.pk, 'title': 'Built elsewhere'}
+
+        def other_build_finishes(seconds):
+            cache.set(key, built)
+
+        with mock.patch('auction.cache.time.sleep', side_effect=other_build_finishes):
+            with self.assertNumQueries(0):
+                self.assertEqual(get_auction_snapshot(self.auction.pk), built)
+
+
+@override_settings(AUCTION_EVENT_BUFFER_SIZE=3)
+@in_process
+class AuctionEventTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidders = [
+            User.objects.create_user(username=f'bidder{i}', password='password')
+            for i in range(2)
+        ]
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+
+    def place_bids(self, count):
+        for i in range(count):
+            accept_bid(self.auction.pk, self.bidders[i % 2].pk, 20 + i)
+
+    def test_bids_are_sequenced(self):
+        """
+        Test that each accepted bid stores a numbered bid_update event.
+        """
+        self.place_bids(2)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.event_seq, 2)
+
+        event = AuctionEvent.objects.get(auction=self.auction, seq=2)
+        frame = event.as_frame()
+        self.assertEqual(frame['type'], 'bid_update')
+        self.assertEqual(frame['seq'], 2)
+        self.assertEqual(frame['bid']['amount'], '21.00')
+        self.assertEqual(frame['bid']['bidder']['username'], 'bidder1')
+
+    def test_buffer_is_bounded(self):
+        """
+        Test that only the most recent events are kept.
+        """
+        self.place_bids(5)
+        self.assertEqual(
+            list(self.auction.events.order_by('seq').values_list('seq', flat=True)),
+            [3, 4, 5])
+
+    def test_missed_events(self):
+        """
+        Test that the missed events are returned while they are buffered.
+        """
+        self.place_bids(5)
+        self.assertEqual(get_missed_events(self.auction.pk, 5), [])
+        self.assertEqual(
+            [frame['seq'] for frame in get_missed_events(self.auction.pk, 3)], [4, 5])
+        self.assertEqual(
+            [frame['seq'] for frame in get_missed_events(self.auction.pk, 2)], [3, 4, 5])
+        # Events 2 and before are gone, and 6 has not happened
+        self.assertIsNone(get_missed_events(self.auction.pk, 1))
+        self.assertIsNone(get_missed_events(self.auction.pk, 6))
+        self.assertIsNone(get_missed_events(0, 0))
+
+    def test_cancel_is_sequenced(self):
+        """
+        Test that canceling an auction stores an event.
+        """
+        self.client.force_authenticate(self.seller)
+        response = self.client.post(
+            reverse('auction_cancel', kwargs={'pk': self.auction.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            get_missed_events(self.auction.pk, 0), [{'type': 'auction_cancelled', 'seq': 1}])
+
+
+@override_settings(AUCTION_WS_MAX_SUBSCRIPTIONS=2)
+@in_process
+class AuctionSubscriptionConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+        self.other_bidder = User.objects.create_user(
+            username='other', password='otherpassword')
+        self.auctions = [
+            Auction.objects.create(
+                seller=self.seller,
+                title=f'Auction {i}',
+                starting_price=10.00,
+                end_time=timezone.now() + timezone.timedelta(days=1),
+            )
+            for i in range(3)
+        ]
+        accept_bid(self.auctions[0].pk, self.bidder.pk, 20)
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/auctions/')
+        communicator.scope['user'] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_subscribe_within_limit(self):
+        """
+        Test that a subscribe is answered with the state of the auctions,
+        and rejects unknown ids and those over the limit.
+        """
+        async def run():
+            communicator = await self.connect()
+            await communicator.send_json_to({
+                'type': 'subscribe',
+                'auctions': [self.auctions[0].pk, 0, self.auctions[1].pk, self.auctions[2].pk],
+            })
+            subscribed = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return subscribed
+
+        subscribed = async_to_sync(run)()
+        self.assertEqual(subscribed['type'], 'subscribed')
+        self.assertEqual(subscribed['auctions'], [{
+            'auction': self.auctions[0].pk,
+            'seq': 1,
+            'current_bid': '20.00',
+            'bid_count': 1,
+            'is_active': True,
+        }])
+        self.assertEqual(
+            sorted(subscribed['rejected']), sorted([0, self.auctions[1].pk, self.auctions[2].pk]))
+
+    def test_compact_updates(self):
+        """
+        Test that the socket gets compact updates for the auctions it is
+        subscribed to, and none after unsubscribing.
+        """
+        first, second = self.auctions[0].pk, self.auctions[1].pk
+
+        async def run():
+            communicator = await self.connect()
+            await communicator.send_json_to({'type': 'subscribe', 'auctions': [first, second]})
+            await communicator.receive_json_from()
+
+            await submit_bid(first, self.other_bidder.pk, '30.00')
+            await submit_bid(second, self.bidder.pk, '15.00')
+            updates = [await communicator.receive_json_from(timeout=5) for _ in range(2)]
+
+            await communicator.send_json_to({'type': 'unsubscribe', 'auctions': [first]})
+            unsubscribed = await communicator.receive_json_from()
+            await submit_bid(first, self.bidder.pk, '40.00')
+            self.assertTrue(await communicator.receive_nothing())
+
+            await communicator.send_json_to({'type': 'subscribe', 'auctions': 'all'})
+            error = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return updates, unsubscribed, error
+
+        updates, unsubscribed, error = async_to_sync(run)()
+        self.assertEqual(updates, [
+            {'type': 'price', 'auction': first, 'seq': 2,
+             'current_bid': '30.00', 'bid_count_delta': 1},
+            {'type': 'price', 'auction': second, 'seq': 1,
+             'current_bid': '15.00', 'bid_count_delta': 1},
+        ])
+        self.assertEqual(unsubscribed, {'type': 'unsubscribed', 'auctions': [first]})
+        self.assertEqual(error['type'], 'error')
+
+
+@in_process
+class AuctionClosingTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+        self.now = timezone.now()
+
+    def create_auction(self, ends_in, **kwargs):
+        return Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=self.now + timezone.timedelta(seconds=ends_in),
+            **kwargs
+        )
+
+    def test_close_records_winner_and_event(self):
+        """
+        Test that closing an ended auction records its highest bidder as
+        the winner and stores an auction_closed event.
+        """
+        auction = self.create_auction(60)
+        accept_bid(auction.pk, self.bidder.pk, 20)
+        unsold = self.create_auction(60)
+
+        later = self.now + timezone.timedelta(seconds=61)
+        with mock.patch('auction.closing.broadcast_event_sync') as broadcast:
+            events = close_auctions([auction.pk, unsold.pk], later)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(broadcast.call_count, 2)
+
+        auction.refresh_from_db()
+        self.assertFalse(auction.is_active)
+        self.assertEqual(auction.winner, self.bidder)
+        self.assertEqual(auction.events.get(seq=2).as_frame(), {
+            'type': 'auction_closed',
+            'seq': 2,
+            'final_bid': '20.00',
+            'winner': {'id': self.bidder.pk, 'username': 'bidder'},
+        })
+        unsold.refresh_from_db()
+        self.assertFalse(unsold.is_active)
+        self.assertIsNone(unsold.winner)
+        self.assertIsNone(unsold.events.get().data['winner'])
+
+        # Already closed
+        self.assertEqual(close_auctions([auction.pk], later), [])
+
+    def test_close_skips_auctions_not_due(self):
+        """
+        Test that an auction is not closed before its end time.
+        """
+        auction = self.create_auction(60)
+        self.assertEqual(close_auctions([auction.pk], self.now), [])
+        auction.refresh_from_db()
+        self.assertTrue(auction.is_active)
+
+    def test_closer_schedules_and_closes_in_batches(self):
+        """
+        Test that the closer schedules the auctions due within its
+        lookahead, overdue ones included, and closes them as they come due.
+        """
+        overdue = [self.create_auction(-60), self.create_auction(-30)]
+        soon = self.create_auction(30)
+        later = self.create_auction(600)
+        self.create_auction(-10, is_active=False)
+
+        closer = AuctionCloser(timezone.timedelta(seconds=60), batch_size=1)
+        self.assertEqual(closer.rescan(self.now), 3)
+        self.assertEqual(closer.next_end_time(), overdue[0].end_time)
+
+        with mock.patch('auction.closing.broadcast_event_sync'), \
+                mock.patch('auction.closing.close_auctions', wraps=close_auctions) as close:
+            self.assertEqual(closer.close_due(self.now), 2)
+            self.assertEqual([call.args[0] for call in close.call_args_list],
+                             [[overdue[0].pk], [overdue[1].pk]])
+            self.assertEqual(closer.next_end_time(), soon.end_time)
+            self.assertEqual(closer.close_due(soon.end_time), 1)
+        self.assertIsNone(closer.next_end_time())
+
+        self.assertEqual(
+            set(Auction.objects.filter(is_active=True).values_list('pk', flat=True)),
+            {later.pk})
+
+    def test_command_once(self):
+        """
+        Test that close_auctions --once closes the auctions already due.
+        """
+        self.create_auction(-60)
+        self.create_auction(60)
+        out = StringIO()
+        with mock.patch('auction.closing.broadcast_event_sync'):
+            call_command('close_auctions', '--once', stdout=out)
+        self.assertIn("Closed 1 auctions.", out.getvalue())
+        self.assertEqual(Auction.objects.filter(is_active=True).count(), 1)
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'),
+            "Checks SQLite and PostgreSQL query plans")
+@override_settings(AUCTION_LIST_CACHE_TIMEOUT=0)
+@in_process
+class QueryPlanTests(APITestCase):
+    """
+    Runs each endpoint on seeded data, and checks the plan of every query
+    it makes for a full table scan or a sort that no index serves.
+
+    On SQLite the plan is that of EXPLAIN QUERY PLAN.  On PostgreSQL, whose
+    planner prefers a Seq Scan and a Sort over an index on tables this
+    small, the plan is that of EXPLAIN with enable_seqscan and enable_sort
+    off, so that only the scans and sorts no index can replace are left.
+    Other databases are not checked.
+    """
+    # EXPLAIN QUERY PLAN lines of a full scan of a table, or of a sort
+    full_scan = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$')
+    temp_sort = 'USE TEMP B-TREE'
+
+    # EXPLAIN nodes of a sequential scan of a table, or of a sort
+    seq_scan_or_sort = re.compile(r'^\s*(->\s+)?(Seq Scan on \S+( \S+)?|Sort|Incremental Sort)\s+\(cost=')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        cls.users = [
+            User.objects.create_user(username=f'user{i}', password='password')
+            for i in range(5)
+        ]
+        now = timezone.now()
+        cls.auctions = [
+            Auction.objects.create(
+                seller=cls.seller,
+                title=f'Auction {i}',
+                starting_price=10.00,
+                end_time=now + timezone.timedelta(days=1 + i % 7),
+                is_active=i % 5 != 0,
+            )
+            for i in range(30)
+        ]
+        cls.auction = cls.auctions[1]
+        for i, user in enumerate(cls.users):
+            accept_bid(cls.auction.pk, user.pk, 20 + i)
+            Like.objects.create(auction=cls.auction, user=user)
+            Comment.objects.create(
+                auction=cls.auction, user=user, comment_text='Comment', is_deleted=i == 0)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Until the end of the transaction of the test
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def is_unindexed(self, line):
+        if connection.vendor == 'postgresql':
+            return self.seq_scan_or_sort.match(line) is not None
+        return bool(self.full_scan.match(line) or self.temp_sort in line)
+
+    def assertIndexedQueries(self, request):
+        """
+        Runs request(), and fails on any query planned with a full scan or
+        a temporary sort.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            checked += 1
+            for line in self.explain(sql):
+                self.assertFalse(self.is_unindexed(line), f"{line}\nin: {sql}")
+        self.assertGreater(checked, 0)
+        return response
+
+    def test_auction_list(self):
+        url = reverse('auction_list')
+        for query in ('', '?is_active=true', '?is_active=false', '?ordering=-created_at',
+                      '?ordering=end_time', '?is_active=true&ordering=-end_time&page_size=5'):
+            with self.subTest(query=query):
+                response = self.assertIndexedQueries(lambda: self.client.get(url + query))
+                if response.data['next']:
+                    self.assertIndexedQueries(lambda: self.client.get(response.data['next']))
+
+    def test_auction_detail(self):
+        url = reverse('auction_detail', kwargs={'pk': self.auction.pk})
+        self.assertIndexedQueries(lambda: self.client.get(url))
+
+    def test_place_bid(self):
+        bidder = User.objects.create_user(username='bidder', password='password')
+        self.client.force_authenticate(bidder)
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+        self.assertIndexedQueries(
+            lambda: self.client.post(url, {'amount': 100.00}, format='json'))
+
+    def test_comments(self):
+        url = reverse('manage_comment', kwargs={'pk': self.auction.pk})
+        response = self.assertIndexedQueries(lambda: self.client.get(url + '?page_size=2'))
+        self.assertIndexedQueries(lambda: self.client.get(response.data['next']))
+
+        self.client.force_authenticate(self.users[1])
+        self.assertIndexedQueries(
+            lambda: self.client.post(url, {'comment_text': 'New'}, format='json'))
+        comment = Comment.objects.get(auction=self.auction, user=self.users[1], comment_text='Comment')
+        url = reverse('manage_comment_id', kwargs={'pk': self.auction.pk, 'comment_id': comment.pk})
+        self.assertIndexedQueries(lambda: self.client.delete(url))
+
+    def test_like(self):
+        url = reverse('manage_like', kwargs={'pk': self.auctions[2].pk})
+        self.client.force_authenticate(self.users[0])
+        self.assertIndexedQueries(lambda: self.client.post(url))
+        self.assertIndexedQueries(lambda: self.client.delete(url))
+
+    def test_user_info(self):
+        token = Token.objects.create(user=self.users[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertIndexedQueries(lambda: self.client.get(reverse('user_info')))
+
+    def test_closer_rescan(self):
+        closer = AuctionCloser(timezone.timedelta(days=2), batch_size=100)
+        with CaptureQueriesContext(connection) as queries:
+            closer.rescan(timezone.now())
+        for line in self.explain(queries.captured_queries[0]['sql']):
+            self.assertFalse(self.is_unindexed(line), line)
+
+
+class QueryBudget:
+    """
+    The most SQL queries, and total SQL time in milliseconds, one request
+    to an endpoint may take, however many rows there are.
+    """
+
+    def __init__(self, queries, sql_ms):
+        self.queries = queries
+        self.sql_ms = sql_ms
+
+
+# Budgets by (URL name, method), counting the token lookup of the
+# authenticated ones
+QUERY_BUDGETS = {
+    ('auction_list', 'GET'): QueryBudget(queries=1, sql_ms=50),
+    ('auction_detail', 'GET'): QueryBudget(queries=5, sql_ms=50),
+    ('place_bid', 'POST'): QueryBudget(queries=10, sql_ms=100),
+    ('manage_comment', 'GET'): QueryBudget(queries=4, sql_ms=50),
+    ('manage_comment', 'POST'): QueryBudget(queries=7, sql_ms=100),
+    ('manage_like', 'POST'): QueryBudget(queries=7, sql_ms=100),
+    ('manage_like', 'DELETE'): QueryBudget(queries=8, sql_ms=100),
+    ('user_info', 'GET'): QueryBudget(queries=2, sql_ms=50),
+}
+
+
+class QueryBudgetMixin:
+    """
+    Seeds `rows` auctions, and as many users, bids, likes and comments on
+    one of them, then requests each endpoint as a token-authenticated
+    client and holds it to its QUERY_BUDGETS entry.  Subclasses run it at
+    several sizes, so a query count that grows with the data fails.
+    """
+    rows = None
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('password')
+        User.objects.bulk_create([
+            User(username=f'user{i}', password=password) for i in range(cls.rows + 2)
+        ])
+        users = list(User.objects.order_by('pk'))
+        cls.seller, cls.user = users[0], users[1]
+        cls.token = Token.objects.create(user=cls.user)
+
+        end_time = timezone.now() + timezone.timedelta(days=7)
+        Auction.objects.bulk_create([
+            Auction(seller=cls.seller, title=f'Auction {i}', starting_price=10, end_time=end_time)
+            for i in range(cls.rows)
+        ])
+        cls.auction = Auction.objects.order_by('pk').first()
+
+        bidders = users[2:]
+        Bid.objects.bulk_create([
+            Bid(auction=cls.auction, bidder=bidder, amount=11 + i)
+            for i, bidder in enumerate(bidders)
+        ])
+        Like.objects.bulk_create([Like(auction=cls.auction, user=user) for user in bidders])
+        Comment.objects.bulk_create([
+            Comment(auction=cls.auction, user=user, comment_text='Comment') for user in bidders
+        ])
+        top = Bid.objects.filter(auction=cls.auction).order_by('-amount').first()
+        Auction.objects.filter(pk=cls.auction.pk).update(
+            current_bid=top.amount, current_bidder=top.bidder, highest_bid=top,
+            bid_count=cls.rows, like_count=cls.rows, comment_count=cls.rows)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assertWithinBudget(self, url_name, method, url, data=None):
+        budget = QUERY_BUDGETS[(url_name, method)]
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(url, data, format='json')
+        self.assertLess(response.status_code, 400, response.data)
+
+        count = len(queries.captured_queries)
+        sql_ms = sum(float(query['time']) for query in queries.captured_queries) * 1000
+        self.assertLessEqual(
+            count, budget.queries,
+            f"{method} {url_name} made {count} queries at {self.rows} rows, "
+            f"over its budget of {budget.queries}:\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries))
+        self.assertLessEqual(
+            sql_ms, budget.sql_ms,
+            f"{method} {url_name} spent {sql_ms:.1f}ms in SQL at {self.rows} rows, "
+            f"over its budget of {budget.sql_ms}ms")
+        return response
+
+    @override_settings(AUCTION_LIST_CACHE_TIMEOUT=0)
+    def test_auction_list(self):
+        self.client.credentials()
+        url = reverse('auction_list')
+        self.assertWithinBudget('auction_list', 'GET', url)
+        self.assertWithinBudget('auction_list', 'GET', url + '?is_active=true&ordering=-end_time')
+
+    def test_auction_detail(self):
+        self.client.credentials()
+        self.assertWithinBudget(
+            'auction_detail', 'GET', reverse('auction_detail', kwargs={'pk': self.auction.pk}))
+
+    def test_place_bid(self):
+        self.assertWithinBudget(
+            'place_bid', 'POST', reverse('place_bid', kwargs={'pk': self.auction.pk}),
+            {'amount': self.rows + 100})
+
+    def test_manage_comment(self):
+        url = reverse('manage_comment', kwargs={'pk': self.auction.pk})
+        self.assertWithinBudget('manage_comment', 'GET', url)
+        self.assertWithinBudget('manage_comment', 'POST', url, {'comment_text': 'New'})
+
+    def test_manage_like(self):
+        url = reverse('manage_like', kwargs={'pk': self.auction.pk})
+        self.assertWithinBudget('manage_like', 'POST', url)
+        self.assertWithinBudget('manage_like', 'DELETE', url)
+
+    def test_user_info(self):
+        self.assertWithinBudget('user_info', 'GET', reverse('user_info'))
+
+
+@in_process
+class QueryBudgetAt1RowTests(QueryBudgetMixin, APITestCase):
+    rows = 1
+
+
+@in_process
+class QueryBudgetAt10RowsTests(QueryBudgetMixin, APITestCase):
+    rows = 10
+
+
+@in_process
+class QueryBudgetAt1000RowsTests(QueryBudgetMixin, APITestCase):
+    rows = 1000
+
+
+@in_process
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.auction = Auction.objects.create(
+            seller=self.user,
+            title='Test Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=7),
+        )
+        self.url = reverse('auction_detail', kwargs={'pk': self.auction.pk})
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    @override_settings(SERVER_TIMING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+    def test_profiled_request(self):
+        """
+        Test that a profiled request reports its sections in Server-Timing
+        and in a JSON log line.
+        """
+        with self.assertLogs('server.timing', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sections = {
+            entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(set(sections), {'db', 'auth', 'serialize', 'view', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', sections['db'])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'auction_detail')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], len(queries))
+        self.assertGreaterEqual(line['total_ms'], line['view_ms'])
+
+    @override_settings(SERVER_TIMING={'ENABLED': True, 'SAMPLE_RATE': 0})
+    def test_unsampled_request(self):
+        """
+        Test that requests outside the sample are not profiled.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING={'ENABLED': False, 'SAMPLE_RATE': 1.0})
+    def test_disabled(self):
+        """
+        Test that nothing is profiled unless enabled.
+        """
+        response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@in_process
+class MetricsTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            username='seller', password='sellerpassword')
+        self.bidder = User.objects.create_user(
+            username='bidder', password='bidderpassword')
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Metered Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def test_metrics_endpoint(self):
+        """
+        Test that /metrics serves the metrics in the Prometheus text format
+        to an allowed address, without authentication.
+        """
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        for name in ('http_request_duration_seconds', 'websocket_connections',
+                     'channel_layer_publish_seconds', 'auction_bids_total',
+                     'database_sync_to_async_calls'):
+            self.assertIn(name, body)
+
+    @override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.1'], 'TOKEN': 'scraper-token'})
+    def test_metrics_access(self):
+        """
+        Test that /metrics is forbidden to other addresses, unless they send
+        the scraper token.
+        """
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(url, headers={'authorization': 'Bearer wrong-token'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(url, headers={'authorization': 'Bearer scraper-token'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_view_latency(self):
+        """
+        Test that the latency of a request is recorded by view, method and
+        status.
+        """
+        labels = {'view': 'auction_detail', 'method': 'GET', 'status': '200'}
+        before = sample('http_request_duration_seconds_count', **labels)
+        response = self.client.get(reverse('auction_detail', kwargs={'pk': self.auction.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sample('http_request_duration_seconds_count', **labels), before + 1)
+
+    def test_bids_by_result(self):
+        """
+        Test that accepted and rejected bids are counted, the rejected ones
+        by code.
+        """
+        accepted = sample('auction_bids_total', result='accepted')
+        outbid = sample('auction_bids_total', result=BidRejected.OUTBID)
+        own_auction = sample('auction_bids_total', result=BidRejected.OWN_AUCTION)
+        accept_bid(self.auction.pk, self.bidder.pk, Decimal('20.00'))
+        with self.assertRaises(BidRejected):
+            accept_bid(self.auction.pk, self.seller.pk, Decimal('5.00'))
+        with self.assertRaises(BidRejected):
+            accept_bid(self.auction.pk, self.seller.pk, Decimal('30.00'))
+        self.assertEqual(sample('auction_bids_total', result='accepted'), accepted + 1)
+        self.assertEqual(sample('auction_bids_total', result=BidRejected.OUTBID), outbid)
+        self.assertEqual(
+            sample('auction_bids_total', result=BidRejected.OWN_AUCTION), own_auction + 2)
+
+    def test_invalid_bids(self):
+        """
+        Test that place_bid counts the bids failing validation, and those
+        on the bidder's own auction.
+        """
+        invalid = sample('auction_bids_total', result='invalid')
+        own_auction = sample('auction_bids_total', result=BidRejected.OWN_AUCTION)
+        client = APIClient()
+        url = reverse('place_bid', kwargs={'pk': self.auction.pk})
+
+        client.force_authenticate(self.bidder)
+        response = client.post(url, {'amount': 5.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        client.force_authenticate(self.seller)
+        response = client.post(url, {'amount': 50.00}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.assertEqual(sample('auction_bids_total', result='invalid'), invalid + 1)
+        self.assertEqual(
+            sample('auction_bids_total', result=BidRejected.OWN_AUCTION), own_auction + 1)
+
+    def test_websocket_metrics(self):
+        """
+        Test that sockets are counted while open, per consumer and per
+        auction group until the group is left, and that a broadcast is timed
+        and its deliveries counted.
+        """
+        auction = str(self.auction.pk)
+
+        async def run():
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), f'/ws/auction/{self.auction.pk}/')
+            communicator.scope['user'] = AnonymousUser()
+            await communicator.connect()
+            await communicator.receive_json_from()
+            subscriber = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), '/ws/auctions/')
+            await subscriber.connect()
+            await subscriber.send_json_to({'type': 'subscribe', 'auctions': [self.auction.pk]})
+            await subscriber.receive_json_from()
+
+            open_counts = (
+                sample('websocket_connections', consumer='auction'),
+                sample('websocket_connections', consumer='subscription'),
+                sample('websocket_group_members', auction=auction),
+            )
+            await broadcast_event(self.auction.pk, {'type': 'auction_cancelled', 'seq': 1})
+            await communicator.receive_json_from()
+            await subscriber.receive_json_from()
+            await communicator.disconnect()
+            await subscriber.disconnect()
+            return open_counts
+
+        sends = sample('channel_layer_group_sends_total', type='auction_cancelled')
+        published = sample('channel_layer_publish_seconds_count')
+        delivered = sample('websocket_group_deliveries_total', consumer='auction')
+        connections = sample('websocket_connections', consumer='auction')
+
+        open_counts = async_to_sync(run)()
+        self.assertEqual(open_counts, (connections + 1, open_counts[1], 2))
+        self.assertGreaterEqual(open_counts[1], 1)
+        self.assertEqual(sample('websocket_connections', consumer='auction'), connections)
+        # The group left by every socket is no longer exported
+        self.assertIsNone(
+            REGISTRY.get_sample_value('websocket_group_members', {'auction': auction}))
+        self.assertEqual(
+            sample('channel_layer_group_sends_total', type='auction_cancelled'), sends + 1)
+        self.assertEqual(sample('channel_layer_publish_seconds_count'), published + 1)
+        self.assertEqual(
+            sample('websocket_group_deliveries_total', consumer='auction'), delivered + 1)
+
+    def test_database_calls(self):
+        """
+        Test that database_sync_to_async counts its calls while they are in
+        flight and running.
+        """
+        states = []
+
+        def probe():
+            states.append((
+                sample('database_sync_to_async_calls', state='in_flight'),
+                sample('database_sync_to_async_calls', state='running'),
+            ))
+
+        async_to_sync(executors.database_sync_to_async(probe))()
+        self.assertEqual(states, [(1, 1)])
+        self.assertEqual(sample('database_sync_to_async_calls', state='in_flight'), 0)
+        self.assertEqual(sample('database_sync_to_async_calls', state='running'), 0)
+
+
+@override_settings(
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    EXECUTOR_POOLS={'ENABLED': True, 'BIDS': 1, 'READS': 1, 'CONSUMERS': 1},
+)
+class ExecutorPoolTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='password')
+        self.bidder = User.objects.create_user(username='bidder', password='password')
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=Decimal('10.00'),
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def block_reads(self):
+        """
+        Occupies the only thread of the reads pool until release is set,
+        and returns the future of the call.
+        """
+        started = threading.Event()
+
+        def read():
+            started.set()
+            self.release.wait(5)
+
+        future = executors.get_executor(executors.READS).submit(read)
+        self.assertTrue(started.wait(5))
+        return future
+
+    def test_pools_disabled(self):
+        """
+        Test that calls run in the shared thread-sensitive executor while
+        the pools are disabled.
+        """
+        with override_settings(EXECUTOR_POOLS={'ENABLED': False}):
+            self.assertIsNone(executors.get_executor(executors.BIDS))
+            names = []
+            async_to_sync(executors.database_sync_to_async(
+                lambda: names.append(threading.current_thread().name), pool=executors.BIDS))()
+            self.assertEqual(names, [threading.current_thread().name])
+
+    def test_calls_run_in_their_pool(self):
+        """
+        Test that calls run in a thread of the pool of their workload
+        class, the consumers' by default.
+        """
+        def thread_name():
+            return threading.current_thread().name
+
+        self.assertTrue(async_to_sync(executors.database_sync_to_async(
+            thread_name, pool=executors.BIDS))().startswith('bids-pool'))
+        self.assertTrue(async_to_sync(executors.database_sync_to_async(
+            thread_name))().startswith('consumers-pool'))
+
+    def test_pool_metrics(self):
+        """
+        Test that each pool reports its size and its calls queued and
+        running.
+        """
+        self.block_reads()
+        queued = executors.get_executor(executors.READS).submit(lambda: None)
+        self.assertEqual(sample('executor_pool_size', pool='reads'), 1)
+        self.assertEqual(sample('executor_pool_calls', pool='reads', state='running'), 1)
+        self.assertEqual(sample('executor_pool_calls', pool='reads', state='queued'), 1)
+
+        self.release.set()
+        queued.result(5)
+        self.assertEqual(sample('executor_pool_calls', pool='reads', state='queued'), 0)
+
+    def test_bids_do_not_queue_behind_reads(self):
+        """
+        Test that a bid is placed while the reads pool is saturated.
+        """
+        reads = self.block_reads()
+        client = APIClient()
+        client.force_authenticate(user=self.bidder)
+        response = client.post(
+            reverse('place_bid', kwargs={'pk': self.auction.pk}), {'amount': '11.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(reads.done())
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, Decimal('11.00'))
+
+
+@in_process
+class LoadTestTests(TransactionTestCase):
+    def test_percentile(self):
+        """
+        Test that percentiles are taken by nearest rank.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3, 1, 2], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+    def test_load_test(self):
+        """
+        Test that a load test places its bids through the application and
+        times their broadcasts to every watcher.
+        """
+        from server.asgi import application
+
+        # One request at a time, as the in-memory test database cannot take
+        # concurrent writers
+        load_test = LoadTest(
+            application, auctions=2, bidders=3, watchers=4, bids=10, reads=6, concurrency=1)
+        load_test.setup()
+        results = async_to_sync(load_test.run)()
+
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(results['accepted'] + results['rejected'], 10)
+        self.assertEqual(results['accepted'], Bid.objects.count())
+        # Every accepted bid reaches the 2 watchers of its auction
+        self.assertEqual(results['deliveries'], results['accepted'] * 2)
+        self.assertLessEqual(results['delay_p50'], results['delay_p99'])
+
+
+@override_settings(AUCTION_LIST_CACHE_TIMEOUT=0)
+@in_process
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='password')
+        self.user = User.objects.create_user(username='bidder', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Test Auction',
+            starting_price=Decimal('10.00'),
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+        accept_bid(self.auction.pk, self.user.pk, Decimal('11.00'))
+        Like.objects.create(auction=self.auction, user=self.user)
+        Comment.objects.create(auction=self.auction, user=self.user, comment_text='Nice pic!!')
+
+    def sync_view_data(self, view, authenticated=False, **kwargs):
+        request = APIRequestFactory().get('/', HTTP_ACCEPT='application/json')
+        if authenticated:
+            force_authenticate(request, user=self.user)
+        return json.loads(view(request, **kwargs).render().content)
+
+    def async_view_response(self, view, method='get', data=None, headers=None, session=None,
+                            **kwargs):
+        """
+        Serves a request through the async view, as the ASGI handler would,
+        with the session cookie of the test client if given.
+        """
+        request = getattr(AsyncRequestFactory(), method)('/', data, headers=headers)
+        if session is not None:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = session
+        SessionMiddleware(lambda request: None).process_request(request)
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_same_data_as_sync_views(self):
+        """
+        Test that the async views answer with the data of the sync views.
+        """
+        pk = self.auction.pk
+        response = self.async_view_response(AsyncAuctionListView)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content)['results'],
+            self.sync_view_data(AuctionListView.as_view())['results'])
+
+        response = self.async_view_response(
+            AsyncAuctionDetailView, headers={'authorization': f'Token {self.token.key}'}, pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['user_has_liked'])
+        self.assertEqual(
+            json.loads(response.content),
+            self.sync_view_data(AuctionDetailView.as_view(), authenticated=True, pk=pk))
+
+        response = self.async_view_response(AsyncCommentListView, pk=pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content)['results'],
+            self.sync_view_data(ManageCommentView.as_view(), pk=pk)['results'])
+
+    def test_missing_auction(self):
+        """
+        Test that the async views answer 404 for an auction that does not
+        exist.
+        """
+        for view in (AsyncAuctionDetailView, AsyncCommentListView):
+            response = self.async_view_response(view, pk=self.auction.pk + 1)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_errors(self):
+        """
+        Test that the async views answer errors as the DRF views do.
+        """
+        response = self.async_view_response(AsyncAuctionListView, data={'is_active': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.async_view_response(
+            AsyncAuctionDetailView, method='put', pk=self.auction.pk)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        response = self.async_view_response(
+            AsyncAuctionListView, headers={'authorization': 'Token invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        response = self.async_view_response(AsyncUserInfoView)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_session_user(self):
+        """
+        Test that the async views read the user of the session.
+        """
+        self.client.force_login(self.user)
+        response = self.async_view_response(
+            AsyncUserInfoView, session=self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'bidder')
+
+
+@in_process
+class ReadBenchmarkTests(TransactionTestCase):
+    def test_benchmark(self):
+        """
+        Test that the benchmark serves its reads through both paths, and
+        times the database calls made alongside.
+        """
+        benchmark = ReadBenchmark(auctions=2, bids=2, comments=2, requests=8, concurrency=1)
+        benchmark.setup()
+        for mode in ('sync', 'async'):
+            results = async_to_sync(benchmark.run)(mode)
+            self.assertEqual(results['mode'], mode)
+            self.assertEqual(results['errors'], 0)
+            self.assertEqual(results['requests'], 8)
+            self.assertGreater(results['probes'], 0)
+            self.assertGreater(results['bids'], 0)
+            self.assertLessEqual(results['latency_p50'], results['latency_p99'])
+
+
+class SeedScaleTests(APITestCase):
+    def test_skewed_counts(self):
+        """
+        Test that a skewed split adds up to the total and favors a few
+        auctions, and that a skew of 0 splits evenly.
+        """
+        counts = skewed_counts(1000, 10, 1.0, random.Random(0))
+        self.assertEqual(sum(counts), 1000)
+        self.assertGreater(max(counts), 3 * sorted(counts)[len(counts) // 2])
+        self.assertEqual(skewed_counts(100, 10, 0, random.Random(0)), [10] * 10)
+
+    def test_seed_scale(self):
+        """
+        Test that seed_scale creates the requested rows with counters and
+        highest bids that match them.
+        """
+        out = StringIO()
+        call_command(
+            'seed_scale', '--users', '10', '--auctions', '25', '--bids-per-auction', '4',
+            '--likes-per-auction', '1', '--comments-per-auction', '1', '--batch-size', '10',
+            stdout=out)
+        self.assertIn('Seeded 10 users, 25 auctions, 100 bids, 25 likes and 25 comments', out.getvalue())
+        self.assertEqual(User.objects.filter(username__startswith='seed-').count(), 10)
+        self.assertEqual(Bid.objects.count(), 100)
+        # Every seeded user has its profile, and can be saved
+        user = User.objects.get(username='seed-0')
+        self.assertIsNotNone(user.profile.pk)
+        user.save()
+
+        for auction in Auction.objects.with_actual_counts().select_related('highest_bid'):
+            self.assertEqual(auction.bid_count, auction.actual_bid_count)
+            self.assertEqual(auction.like_count, auction.actual_like_count)
+            self.assertEqual(auction.comment_count, auction.actual_comment_count)
+            highest = auction.bid_set.order_by('-amount').first()
+            self.assertEqual(auction.highest_bid, highest)
+            if highest is not None:
+                self.assertEqual(auction.current_bid, highest.amount)
+                self.assertEqual(auction.current_bidder_id, highest.bidder_id)
+                self.assertNotEqual(highest.bidder_id, auction.seller_id)
+            if not auction.is_active:
+                self.assertEqual(auction.winner_id, auction.current_bidder_id)
+
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', '--users', '10', '--auctions', '1', stdout=out)
@@ -1,45 +1,213 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from auction.broadcast import broadcast_event_sync
+from auction.cache import (
+    aauction_list_cache_key,
+    auction_list_cache_key,
+    get_auction_list_timeout,
+    make_etag,
+    set_cache_headers,
+)
+from auction.events import record_event
 from auction.models import Auction
+from auction.pagination import AuctionCursorPagination
 from auction.serializers import (
     AuctionListSerializer,
     AuctionDetailSerializer,
     AuctionCreateSerializer,
 )
+from server.async_views import AsyncReadView
+
+
+def get_auction_list_queryset(request):
+    """
+    Returns the auctions listed for the request, filtered by its is_active
+    query parameter if given.
+    """
+    queryset = Auction.objects.with_summary()
+    is_active = request.query_params.get('is_active', None)
+    if is_active is not None:
+        if is_active.lower() == 'true':
+            return queryset.filter(is_active=True)
+        elif is_active.lower() == 'false':
+            return queryset.filter(is_active=False)
+        else:
+            raise ValidationError('Invalid query parameter for is_active.')
+    return queryset
+
+
+def get_auction_list_etag(request, key):
+    """
+    Returns the ETag of the list page cached under key, and a 304 response
+    when the client already has that page, else None.  Writes to auctions,
+    bids, likes and comments invalidate the cached pages, and change their
+    ETag.
+    """
+    etag = make_etag(key)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_cache_headers(response, etag)
+    return etag, response
+
+
+def get_auction_detail_queryset():
+    return Auction.objects.select_related('seller').prefetch_related('comments')
+
+
+def get_auction_version(pk):
+    """
+    Returns the version of the auction: updated_at plus the counters.
+    Raises Http404 when there is no such auction.
+    """
+    version = Auction.objects.filter(pk=pk).values_list(
+        'updated_at', 'bid_count', 'like_count', 'comment_count').first()
+    if version is None:
+        raise Http404('No Auction matches the given query.')
+    return version
+
+
+class AuctionDetailETag:
+    """
+    Conditional response headers of an auction at a version, as seen by the
+    requesting user, since user_has_liked depends on them.  Responses to an
+    anonymous user may be cached by shared caches.
+    """
+
+    def __init__(self, request, pk, version):
+        user = request.user
+        self.etag = make_etag('auction', pk, *version,
+                              user.pk if user.is_authenticated else 'anonymous')
+        self.updated_at = version[0]
+        self.public = not user.is_authenticated
+
+    def get_not_modified(self, request):
+        """
+        Returns a 304 response when the client already has this version,
+        else None.
+        """
+        return get_conditional_response(
+            request, etag=self.etag, last_modified=int(self.updated_at.timestamp()))
+
+    def set_headers(self, response):
+        set_cache_headers(response, self.etag, self.updated_at, public=self.public)
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
 
 
 class AuctionListView(generics.ListAPIView):
     """
-    Lists all active auctions.
+    Lists all active auctions, one cursor page at a time.
     """
     serializer_class = AuctionListSerializer
     permission_classes = [AllowAny]
+    pagination_class = AuctionCursorPagination
 
     def get_queryset(self):
-        is_active = self.request.query_params.get('is_active', None)
-        if is_active is not None:
-            if is_active.lower() == 'true':
-                return Auction.objects.filter(is_active=True)
-            elif is_active.lower() == 'false':
-                return Auction.objects.filter(is_active=False)
-            else:
-                raise ValidationError('Invalid query parameter for is_active.')
-        return Auction.objects.all()
+        return get_auction_list_queryset(self.request)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serves the page from the shared cache when it is there, and answers
+        with 304 when the client's ETag still matches it.
+        """
+        key = auction_list_cache_key(request, self.paginator)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+
+        etag, response = get_auction_list_etag(request, key)
+        if response is not None:
+            return response
+
+        timeout = get_auction_list_timeout()
+        data = cache.get(key) if timeout else None
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if timeout:
+                cache.set(key, response.data, timeout)
+        else:
+            response = Response(data)
+        return set_cache_headers(response, etag)
 
 
 class AuctionDetailView(generics.RetrieveAPIView):
     """
     Retrieves a single auction.
     """
-    queryset = Auction.objects.all()
     serializer_class = AuctionDetailSerializer
     permission_classes = [AllowAny]
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        return get_auction_detail_queryset()
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Answers with 304 when the client already has the current version of
+        the auction, without serializing it.
+        """
+        etag = AuctionDetailETag(request, kwargs['pk'], get_auction_version(kwargs['pk']))
+        response = etag.get_not_modified(request)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return etag.set_headers(response)
+
+
+class AsyncAuctionListView(AsyncReadView):
+    """
+    AuctionListView on the event loop, reading in the reads pool.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        paginator = AuctionCursorPagination()
+        key = await aauction_list_cache_key(request, paginator)
+        if key is None:
+            return await self.read(self.list, request, paginator)
+
+        etag, response = get_auction_list_etag(request, key)
+        if response is not None:
+            return response
+
+        timeout = get_auction_list_timeout()
+        data = await cache.aget(key) if timeout else None
+        if data is None:
+            response = await self.read(self.list, request, paginator)
+            if timeout:
+                await cache.aset(key, response.data, timeout)
+        else:
+            response = Response(data)
+        return set_cache_headers(response, etag)
+
+    def list(self, request, paginator):
+        page = paginator.paginate_queryset(get_auction_list_queryset(request), request)
+        serializer = AuctionListSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AsyncAuctionDetailView(AsyncReadView):
+    """
+    AuctionDetailView on the event loop, reading and serializing in the
+    reads pool.
+    """
+
+    async def get(self, request, pk):
+        etag = AuctionDetailETag(request, pk, await self.read(get_auction_version, pk))
+        response = etag.get_not_modified(request)
+        if response is None:
+            response = Response(await self.read(self.retrieve, request, pk))
+        return etag.set_headers(response)
+
+    def retrieve(self, request, pk):
+        auction = get_object_or_404(get_auction_detail_queryset(), pk=pk)
+        return AuctionDetailSerializer(auction, context={'request': request}).data
+
 
 class AuctionCreateView(generics.CreateAPIView):
     """
@@ -70,5 +238,8 @@ def auction_cancel(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
     auction.is_active = False
-    auction.save()
+    with transaction.atomic():
+        auction.save(update_fields=['is_active', 'updated_at'])
+        event = record_event(auction.pk, 'auction_cancelled')
+    broadcast_event_sync(auction.pk, event.as_frame())
     return Response({'message': 'Auction canceled successfully.'}, status=status.HTTP_200_OK)
@@ -1,11 +1,23 @@
-from django.db import transaction
+from asgiref.sync import async_to_sync
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from auction.bidding import BidRejected
+from auction.broadcast import broadcast_event_sync
 from auction.models import Auction
+from auction.sequencer import BidQueueTimeout, bid_sequencer_enabled, get_bid_queue
 from auction.serializers import BidSerializer
+from server.executors import BIDS, database_sync_to_async
+from server.metrics import BIDS as BID_RESULTS
+
+
+# Losing a race to a concurrent bid is a conflict, not a bad request
+REJECTION_STATUS = {
+    BidRejected.OUTBID: status.HTTP_409_CONFLICT,
+    BidRejected.NOT_FOUND: status.HTTP_404_NOT_FOUND,
+}
 
 
 @api_view(['POST'])
@@ -19,7 +31,8 @@ def place_bid(request, pk):
         pk=pk
     )
 
-    if auction.seller == request.user:
+    if auction.seller_id == request.user.pk:
+        BID_RESULTS.labels(result=BidRejected.OWN_AUCTION).inc()
         return Response({'error': 'You cannot bid on your own auction.'}, status=status.HTTP_403_FORBIDDEN)
 
     serializer = BidSerializer(
@@ -30,11 +43,36 @@ def place_bid(request, pk):
         }
     )
     if serializer.is_valid():
+        if bid_sequencer_enabled():
+            return place_sequenced_bid(
+                auction, request.user, serializer.validated_data['amount'])
         try:
-            # Involves multiple models, therefore using transaction/commit
-            with transaction.atomic():
-                serializer.save()
+            # The accept path runs its own transaction, in the bids executor
+            # pool, so it does not queue behind reads
+            async_to_sync(database_sync_to_async(serializer.save, pool=BIDS))()
+        except BidRejected as e:
+            return Response(e.as_dict(), status=REJECTION_STATUS.get(e.code, status.HTTP_400_BAD_REQUEST))
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        broadcast_event_sync(auction.pk, serializer.instance.event.as_frame())
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    # Most bids are rejected here, before they reach the accept path
+    BID_RESULTS.labels(result='invalid').inc()
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def place_sequenced_bid(auction, user, amount):
+    """
+    Hands a validated bid to the auction's sequencer and waits for it to be
+    applied.
+    """
+    try:
+        bid = async_to_sync(get_bid_queue().submit)(auction.pk, user.pk, amount)
+    except BidRejected as e:
+        return Response(e.as_dict(), status=REJECTION_STATUS.get(e.code, status.HTTP_400_BAD_REQUEST))
+    except BidQueueTimeout:
+        return Response(
+            {'error': 'The bid was not processed in time. It may still be accepted.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return Response(bid, status=status.HTTP_201_CREATED)
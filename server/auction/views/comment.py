@@ -3,7 +3,18 @@ from rest_framework import generics, mixins, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from auction.models import Auction, Comment
+from auction.pagination import CommentCursorPagination
 from auction.serializers import CommentSerializer
+from server.async_views import AsyncReadView
+
+
+def get_comment_queryset(auction_pk):
+    """
+    Returns the comments of the auction, leaving out the soft deleted ones.
+    Raises Http404 when there is no such auction.
+    """
+    auction = get_object_or_404(Auction, pk=auction_pk)
+    return Comment.objects.filter(auction=auction, is_deleted=False)
 
 
 class ManageCommentView(
@@ -20,6 +31,7 @@ class ManageCommentView(
     """
 
     serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
 
     def get_permissions(self):
         """
@@ -33,11 +45,9 @@ class ManageCommentView(
         """
         Return the queryset for retrieving comments.  This will be used
         by the mixins.  It is important to define this, and to make
-        it specific to the auction.
+        it specific to the auction.  Soft deleted comments are left out.
         """
-        auction_pk = self.kwargs['pk']  # Get auction primary key from URL
-        auction = get_object_or_404(Auction, pk=auction_pk)
-        return Comment.objects.filter(auction=auction)
+        return get_comment_queryset(self.kwargs['pk'])
 
     def get_object(self):
         """
@@ -118,3 +128,19 @@ class ManageCommentView(
 
     def delete(self, request, *args, **kwargs):
         return self.destroy(request, *args, **kwargs)
+
+
+class AsyncCommentListView(AsyncReadView):
+    """
+    Lists the comments of an auction, as ManageCommentView does, on the
+    event loop, reading in the reads pool.
+    """
+
+    async def get(self, request, pk):
+        return await self.read(self.list, request, pk)
+
+    def list(self, request, pk):
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(get_comment_queryset(pk), request)
+        serializer = CommentSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
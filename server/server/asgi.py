@@ -13,20 +13,26 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 django_asgi_app = get_asgi_application()
 
-from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 
 from auction.routing import websocket_urlpatterns
+from auction.sequencer import BidSequencerConsumer, sequencer_channels
+from user.middleware import TokenAuthMiddleware
 
 
 application = ProtocolTypeRouter(
     {
         'http': django_asgi_app,
         'websocket': AllowedHostsOriginValidator(
-            AuthMiddlewareStack(
+            TokenAuthMiddleware(
                 URLRouter(websocket_urlpatterns)
             )
         ),
+        # Served by `python manage.py runworker bid-sequencer-<n>`
+        'channel': ChannelNameRouter({
+            channel: BidSequencerConsumer.as_asgi()
+            for channel in sequencer_channels()
+        }),
     }
 )
@@ -0,0 +1,100 @@
+"""
+Async read views.
+
+DRF views are sync, so under the ASGI server each request to one holds a
+thread of the sync executor from start to end, the same threads that
+database_sync_to_async calls from the websocket consumers wait for.
+AsyncReadView serves reads on the event loop instead:
+
+- the token is resolved by CachedTokenAuthentication.aauthenticate, which
+  leaves the loop only on a cache miss, and the session user by auser()
+- rows are read, and serialized with the DRF serializers, by sync methods
+  run through read(), in the reads executor pool (see server.executors)
+- the response is rendered as JSON
+
+Django's async ORM runs its queries in the shared sync executor, and cannot
+be given another, so the views read through their pool instead.  Errors are
+answered as DRF answers them.  Only JSON is rendered, there is no browsable
+API.
+
+The URLs route to the sync views.  With the executor pools on, websocket
+calls and bids run in pools of their own, which the sync views do not hold,
+and benchmark_reads measures them faster next to the sync views than next
+to these.  These views only come out ahead with the pools off, and are kept
+for benchmark_reads.
+"""
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+from server.executors import READS, database_sync_to_async
+from server.timing import timed
+from user.authentication import CachedTokenAuthentication
+
+
+async def aauthenticate(request):
+    """
+    Returns the user of the token in the Authorization header, else the
+    active user of the session, else AnonymousUser.  Raises
+    AuthenticationFailed for an invalid token.
+    """
+    with timed('auth'):
+        result = await CachedTokenAuthentication().aauthenticate(request)
+        if result is not None:
+            return result[0]
+        auser = getattr(request._request, 'auser', None)
+        if auser is not None:
+            user = await auser()
+            if user.is_active:
+                return user
+    return request.user
+
+
+class AsyncReadView(View):
+    """
+    Base class of the async read views.  Subclasses implement async get(),
+    which is passed a DRF request and returns a DRF Response.
+    """
+    http_method_names = ['get', 'head']
+    authentication_required = False
+    pool = READS
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        self.request = request
+        try:
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            request.user = await aauthenticate(request)
+            if self.authentication_required and not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    async def read(self, func, *args, **kwargs):
+        """
+        Runs the sync function func, which may query the database, in the
+        pool of the view.
+        """
+        return await database_sync_to_async(func, pool=self.pool)(*args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = CachedTokenAuthentication().authenticate_header(self.request)
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, request, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+            response.renderer_context = {'view': self, 'request': request, 'response': response}
+            response.render()
+        return response
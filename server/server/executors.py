@@ -0,0 +1,99 @@
+"""
+Executor pools per workload class.
+
+sync_to_async and database_sync_to_async run their calls in one shared
+thread-sensitive executor, so a burst of slow reads delays the bids queued
+behind them.  With EXECUTOR_POOLS['ENABLED'], the sync work of each class
+runs in a thread pool of its own instead:
+
+- bids: bids applied by place_bid, by the websocket consumers and by the
+  bid sequencer, EXECUTOR_POOLS['BIDS'] threads
+- reads: the async read views (see server.async_views),
+  EXECUTOR_POOLS['READS'] threads
+- consumers: the other database calls of the websocket consumers and their
+  token lookups, EXECUTOR_POOLS['CONSUMERS'] threads
+
+A saturated pool queues its own calls only.  Each pool thread uses its own
+database connection, so the pools together may open up to BIDS + READS +
+CONSUMERS connections per process.  The size, queued and running calls of
+every pool are exported by server.metrics.
+
+Calls made through a pool do not run in the thread of the request, so they
+do not see a transaction opened by it.  The test suite, which runs each
+test in a transaction, turns the pools off.
+"""
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from server.metrics import MeasuredDatabaseSyncToAsync, MeasuredThreadPoolExecutor
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BIDS': 4,
+    'READS': 4,
+    'CONSUMERS': 4,
+}
+
+BIDS = 'bids'
+READS = 'reads'
+CONSUMERS = 'consumers'
+
+
+def get_executor_settings():
+    return {**DEFAULTS, **getattr(settings, 'EXECUTOR_POOLS', {})}
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(pool):
+    """
+    Returns the executor of the given pool, created on first use, or None
+    when the pools are disabled.
+    """
+    options = get_executor_settings()
+    if not options['ENABLED']:
+        return None
+    with _executors_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = MeasuredThreadPoolExecutor(pool, options[pool.upper()])
+            _executors[pool] = executor
+        return executor
+
+
+def shutdown_executors():
+    """
+    Waits for the calls of every pool to finish and discards the pools.
+    The next call creates them again, with the current settings.
+    """
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown()
+
+
+@receiver(setting_changed)
+def reset_executors(setting, **kwargs):
+    if setting == 'EXECUTOR_POOLS':
+        shutdown_executors()
+
+
+class PooledDatabaseSyncToAsync(MeasuredDatabaseSyncToAsync):
+    """
+    database_sync_to_async that runs its calls in the executor pool of a
+    workload class, the consumers' by default.  Falls back to the shared
+    thread-sensitive executor when the pools are disabled.
+    """
+
+    def __init__(self, func, pool=CONSUMERS):
+        executor = get_executor(pool)
+        super().__init__(func, thread_sensitive=executor is None, executor=executor)
+
+
+database_sync_to_async = PooledDatabaseSyncToAsync
+
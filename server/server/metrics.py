@@ -0,0 +1,289 @@
+"""
+Prometheus metrics, served at /metrics to the scrapers allowed by METRICS.
+
+- http_request_duration_seconds: latency of each view, by view, method and
+  status, from MetricsMiddleware
+- websocket_connections: open sockets of each worker process, by consumer
+- websocket_group_members: sockets joined to each auction group, for the
+  auctions watched by at least one socket
+- channel_layer_group_sends_total and channel_layer_publish_seconds: events
+  published to auction groups, and the time group_send took
+- auction_broadcast_frames_total: frames received by the broadcaster, sent
+  to their groups, and saved by coalescing bid_update frames (see
+  AUCTION_BROADCAST_COALESCE_MS)
+- websocket_group_deliveries_total: events received by sockets from their
+  groups.  A group_send does not report its number of receivers, so the
+  fan-out is the rate of deliveries over the rate of group sends.
+- auction_bids_total: bids accepted, rejected by rejection code, or
+  rejected as invalid by the validation of place_bid and the websocket
+- database_sync_to_async_calls: calls in flight through
+  database_sync_to_async, and how many of those are running.  The rest are
+  queued for the database thread.
+- executor_pool_size and executor_pool_calls: threads of each executor pool
+  (see server.executors), and the calls queued for them or running
+
+Every worker process keeps its own values.  When the server runs several
+processes, set the PROMETHEUS_MULTIPROC_DIR environment variable to an
+empty directory shared by them, before they start, and /metrics aggregates
+the values written there by all of them.  The multiprocess files keep
+the websocket_group_members value of a group left by every socket, at 0,
+until their process exits.
+
+/metrics answers the addresses in METRICS['ALLOWED_IPS'] and the requests
+carrying METRICS['TOKEN'] as a Bearer token, and 403 to anyone else.
+"""
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+
+
+DEFAULTS = {
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': None,
+}
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+
+PUBLISH_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling HTTP requests, by view.',
+    ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    'websocket_connections',
+    'Open websocket connections of this worker, by consumer.',
+    ['consumer'],
+    # One value per worker process
+    multiprocess_mode='liveall',
+)
+
+WEBSOCKET_GROUP_MEMBERS = Gauge(
+    'websocket_group_members',
+    'Websocket connections joined to each auction group.',
+    ['auction'],
+    multiprocess_mode='livesum',
+)
+
+GROUP_SENDS = Counter(
+    'channel_layer_group_sends',
+    'Events published to auction groups, by event type.',
+    ['type'],
+)
+
+GROUP_DELIVERIES = Counter(
+    'websocket_group_deliveries',
+    'Group events received by websocket connections, by consumer.',
+    ['consumer'],
+)
+
+PUBLISH_LATENCY = Histogram(
+    'channel_layer_publish_seconds',
+    'Time spent in group_send to publish an event to an auction group.',
+    buckets=PUBLISH_BUCKETS,
+)
+
+BROADCAST_FRAMES = Counter(
+    'auction_broadcast_frames',
+    'Frames broadcast to auction groups, by outcome: received, sent or saved by coalescing.',
+    ['outcome'],
+)
+
+BIDS = Counter(
+    'auction_bids',
+    'Bids placed, by result: accepted, invalid or the rejection code.',
+    ['result'],
+)
+
+DATABASE_CALLS = Gauge(
+    'database_sync_to_async_calls',
+    'Calls in flight through database_sync_to_async, and those running.',
+    ['state'],
+    multiprocess_mode='livesum',
+)
+
+
+EXECUTOR_POOL_SIZE = Gauge(
+    'executor_pool_size',
+    'Threads of each executor pool.',
+    ['pool'],
+    multiprocess_mode='livesum',
+)
+
+EXECUTOR_POOL_CALLS = Gauge(
+    'executor_pool_calls',
+    'Calls queued for each executor pool, and those running.',
+    ['pool', 'state'],
+    multiprocess_mode='livesum',
+)
+
+
+_group_members = {}
+_group_members_lock = threading.Lock()
+
+
+def join_group(auction_id):
+    """
+    Counts a socket joining the group of an auction.
+    """
+    # The auction socket has the id from its URL, the subscriptions an int
+    auction = str(auction_id)
+    with _group_members_lock:
+        _group_members[auction] = _group_members.get(auction, 0) + 1
+        WEBSOCKET_GROUP_MEMBERS.labels(auction=auction).inc()
+
+
+def leave_group(auction_id):
+    """
+    Counts a socket leaving the group of an auction, and drops the value of
+    the auction once no socket is left, so that every auction ever watched
+    is not exported forever.
+    """
+    auction = str(auction_id)
+    with _group_members_lock:
+        members = _group_members.pop(auction, 0) - 1
+        WEBSOCKET_GROUP_MEMBERS.labels(auction=auction).dec()
+        if members > 0:
+            _group_members[auction] = members
+        else:
+            WEBSOCKET_GROUP_MEMBERS.remove(auction)
+
+
+class MeasuredDatabaseSyncToAsync(DatabaseSyncToAsync):
+    """
+    database_sync_to_async that counts its calls in flight and running.
+    """
+
+    async def __call__(self, *args, **kwargs):
+        DATABASE_CALLS.labels(state='in_flight').inc()
+        try:
+            return await super().__call__(*args, **kwargs)
+        finally:
+            DATABASE_CALLS.labels(state='in_flight').dec()
+
+    def thread_handler(self, loop, *args, **kwargs):
+        DATABASE_CALLS.labels(state='running').inc()
+        try:
+            return super().thread_handler(loop, *args, **kwargs)
+        finally:
+            DATABASE_CALLS.labels(state='running').dec()
+
+
+class MeasuredThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that reports its size, and its calls queued and
+    running, under the name of its pool.
+    """
+
+    def __init__(self, pool, max_workers):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f'{pool}-pool')
+        self.pool = pool
+        EXECUTOR_POOL_SIZE.labels(pool=pool).inc(max_workers)
+
+    def submit(self, fn, /, *args, **kwargs):
+        queued = EXECUTOR_POOL_CALLS.labels(pool=self.pool, state='queued')
+        running = EXECUTOR_POOL_CALLS.labels(pool=self.pool, state='running')
+
+        def run():
+            queued.dec()
+            running.inc()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                running.dec()
+
+        def forget(future):
+            # A call cancelled while queued never runs
+            if future.cancelled():
+                queued.dec()
+
+        queued.inc()
+        future = super().submit(run)
+        future.add_done_callback(forget)
+        return future
+
+    def shutdown(self, wait=True, **kwargs):
+        super().shutdown(wait=wait, **kwargs)
+        EXECUTOR_POOL_SIZE.labels(pool=self.pool).dec(self._max_workers)
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def get_metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+def is_scraper(request):
+    options = get_metrics_settings()
+    if request.META.get('REMOTE_ADDR') in options['ALLOWED_IPS']:
+        return True
+    token = options['TOKEN']
+    if not token:
+        return False
+    authorization = request.headers.get('Authorization', '')
+    return hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    """
+    Serves the metrics in the Prometheus text format to the scrapers allowed
+    by METRICS.
+    """
+    if not is_scraper(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request by view.  Goes near the top of
+    MIDDLEWARE, so the latency covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start):
+        match = request.resolver_match
+        REQUEST_LATENCY.labels(
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code,
+        ).observe(time.perf_counter() - start)
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'server.timing.ServerTimingMiddleware',
+    'server.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -139,8 +141,8 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication'
+        'user.authentication.CachedTokenAuthentication',
+        'server.timing.SessionAuthentication'
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -148,9 +150,84 @@ REST_FRAMEWORK = {
 }
 
 
+# Server-Timing profiling of a sampled fraction of requests (see
+# server.timing).  Off unless enabled.
+SERVER_TIMING = {
+    "ENABLED": False,
+    "SAMPLE_RATE": 1.0,
+    "LOG": True,
+}
+
+# Caching of the token lookup of API requests (see user.authentication).  A
+# revoked token may keep working in other processes for LOCAL_TIMEOUT
+# seconds.
+TOKEN_AUTH_CACHE = {
+    "LOCAL_SIZE": 10000,
+    "LOCAL_TIMEOUT": 5,
+    "TIMEOUT": 300,
+}
+
+# Access to the Prometheus metrics at /metrics (see server.metrics): the
+# scraper's addresses, or a token it sends as "Authorization: Bearer <token>"
+METRICS = {
+    "ALLOWED_IPS": ['127.0.0.1', '::1'],
+    "TOKEN": None,
+}
+
+# Thread pools of the sync work of bids, reads and websocket consumers (see
+# server.executors), sized per process.  Each thread may hold a database
+# connection.
+EXECUTOR_POOLS = {
+    "ENABLED": True,
+    "BIDS": 4,
+    "READS": 4,
+    "CONSUMERS": 4,
+}
+
+
 # Daphne
 ASGI_APPLICATION = "server.asgi.application"
 
+# Cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# Seconds a cached auction list page may be served before it is rebuilt
+AUCTION_LIST_CACHE_TIMEOUT = 30
+
+# Seconds a reverse proxy may reuse a public auction response before
+# revalidating it with its ETag
+AUCTION_HTTP_MAX_AGE = 5
+
+# Seconds the auction snapshot sent to new sockets is kept in the cache.  It
+# is invalidated on every bid and cancel.
+AUCTION_SNAPSHOT_CACHE_TIMEOUT = 300
+
+# Number of recent events kept per auction for sockets that reconnect with
+# ?since=<seq>.  A socket that missed more is sent a snapshot instead.
+AUCTION_EVENT_BUFFER_SIZE = 100
+
+# Number of auctions a single ws/auctions/ socket may subscribe to
+AUCTION_WS_MAX_SUBSCRIPTIONS = 100
+
+# Milliseconds during which the bid_updates of an auction are collapsed into
+# one broadcast carrying the latest bid.  0 broadcasts every bid.
+AUCTION_BROADCAST_COALESCE_MS = 0
+
+# Sequenced bid placement for hot auctions.  When enabled, bids are queued
+# per auction and applied in order by `runworker bid-sequencer-<n>`, one
+# worker process per shard.
+AUCTION_BID_SEQUENCER = {
+    "ENABLED": False,
+    "BACKEND": "auction.sequencer.ChannelLayerBidQueue",
+    "SHARDS": 1,
+    "BATCH_SIZE": 50,
+    "TIMEOUT": 5,
+}
+
 # Channels
 CHANNEL_LAYERS = {
     "default": {
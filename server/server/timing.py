@@ -0,0 +1,210 @@
+"""
+Per-request profiling, reported as Server-Timing headers and log lines.
+
+ServerTimingMiddleware profiles a sampled fraction of requests, set by
+SERVER_TIMING['SAMPLE_RATE'], and is removed from the stack at startup
+unless SERVER_TIMING['ENABLED'].  For a profiled request it reports:
+
+- db: time in SQL, with the number of queries
+- auth: time in DRF authentication
+- serialize: time in serializer to_representation
+- view: time from the view being called to its response being rendered
+- total: time spent below this middleware
+
+The auth and serialize sections come from TimedAuthenticationMixin and
+TimedSerializerMixin.  Outside of a profiled request, each of these costs a
+context variable lookup.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import authentication
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'LOG': True,
+}
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+def get_timing_settings():
+    return {**DEFAULTS, **getattr(settings, 'SERVER_TIMING', {})}
+
+
+class RequestTimings:
+    """
+    Durations in seconds and counts of the sections of one request.
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self.active = set()
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def header(self):
+        entries = []
+        for name, duration in self.durations.items():
+            entry = f'{name};dur={duration * 1000:.1f}'
+            if name == 'db':
+                entry += f';desc="{self.counts[name]} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in self.durations.items()},
+            'queries': self.counts.get('db', 0),
+        }
+
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to section name of the request being
+    profiled, if any.  Nested blocks of the same section count once.
+    """
+    timings = current_timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        timings.active.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - start)
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedAuthenticationMixin:
+    """
+    Times authenticate() as the auth section.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+
+class TimedSerializerMixin:
+    """
+    Times to_representation() as the serialize section.
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class SessionAuthentication(TimedAuthenticationMixin, authentication.SessionAuthentication):
+    pass
+
+
+class ServerTimingMiddleware:
+    """
+    Profiles a sampled fraction of requests.  Goes first in MIDDLEWARE, so
+    total covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = get_timing_settings()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.sample_rate = options['SAMPLE_RATE']
+        self.log = options['LOG']
+        self.get_response = get_response
+
+        # Time the queries of every connection, now and to come
+        connection_created.connect(install_query_timer)
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection=connection)
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings, start)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings, start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            request._server_timing_view_start = time.perf_counter()
+
+    def report(self, request, response, timings, start):
+        now = time.perf_counter()
+        view_start = getattr(request, '_server_timing_view_start', None)
+        if view_start is not None:
+            timings.add('view', now - view_start)
+        timings.add('total', now - start)
+
+        response['Server-Timing'] = timings.header()
+        if self.log:
+            match = request.resolver_match
+            logger.info(json.dumps({
+                'method': request.method,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                **timings.as_dict(),
+            }))
+        return response
@@ -18,11 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from server.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
-    path('api/auction/', include('auction.urls'))
+    path('api/auction/', include('auction.urls')),
+    # Prometheus scrape target, not to be exposed publicly
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if bool(settings.DEBUG):
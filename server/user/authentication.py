@@ -0,0 +1,191 @@
+"""
+Token authentication with the token lookup cached.
+
+DRF's TokenAuthentication reads the token and its user from the database on
+every request.  Here the token, with its user, is looked up in two levels:
+
+- a per-process LRU of TOKEN_AUTH_CACHE['LOCAL_SIZE'] entries, each kept
+  for TOKEN_AUTH_CACHE['LOCAL_TIMEOUT'] seconds
+- the Django cache, shared by the processes, for TOKEN_AUTH_CACHE['TIMEOUT']
+  seconds
+
+and only read from the database on a miss of both.  Only the fields that
+authentication and permission checks read are cached (USER_FIELDS), never
+the password hash or the contact details.  The user of a cached token is
+rebuilt with the other fields deferred, so reading one of them queries the
+database.  Deleting a token, or
+saving its user, e.g. to deactivate them, invalidates both levels of the
+process that made the change (see user.signals).  Other processes may go on
+using their local copy for up to LOCAL_TIMEOUT, which bounds how long a
+revoked token keeps working.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+from server.executors import CONSUMERS, READS, database_sync_to_async
+from server.timing import TimedAuthenticationMixin
+
+
+DEFAULTS = {
+    'LOCAL_SIZE': 10000,
+    'LOCAL_TIMEOUT': 5,
+    'TIMEOUT': 300,
+}
+
+
+# Fields of the user kept with a cached token
+USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_token_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+def token_cache_key(key):
+    # Keep the raw tokens out of the shared cache
+    return 'auth:token:%s' % hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class LocalTokenCache:
+    """
+    Thread-safe LRU of tokens by key, each entry expiring after a timeout.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, token = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return token
+
+    def set(self, key, token, timeout, size):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, token)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_tokens = LocalTokenCache()
+
+
+def get_token(key):
+    """
+    Returns the token of the given key, with its user joined, or None if
+    there is no such token.
+    """
+    options = get_token_cache_settings()
+    token = local_tokens.get(key)
+    if token is not None:
+        return token
+
+    cache_key = token_cache_key(key)
+    user_values = cache.get(cache_key)
+    if user_values is None:
+        user_values = User.objects.filter(auth_token__key=key).values_list(
+            *USER_FIELDS).first()
+        if user_values is None:
+            # Unknown keys are not cached, so guessing cannot fill the cache
+            return None
+        cache.set(cache_key, user_values, options['TIMEOUT'])
+
+    token = build_token(key, user_values)
+    local_tokens.set(key, token, options['LOCAL_TIMEOUT'], options['LOCAL_SIZE'])
+    return token
+
+
+def build_token(key, user_values):
+    """
+    Returns the token of the given key, with its user built from the
+    cached USER_FIELDS and the other fields deferred.
+    """
+    values = dict(zip(USER_FIELDS, user_values))
+    # from_db takes the values in the order of the model's fields
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    user = User.from_db(None, fields, [values[field] for field in fields])
+    token = Token.from_db(None, ['key', 'user_id'], [key, user.pk])
+    token.user = user
+    return token
+
+
+async def aget_token(key, pool=CONSUMERS):
+    """
+    get_token for async code.  A token in the local cache is returned
+    without leaving the event loop, others are looked up in the given
+    executor pool.
+    """
+    token = local_tokens.get(key)
+    if token is None:
+        token = await database_sync_to_async(get_token, pool=pool)(key)
+    return token
+
+
+def invalidate_token(key):
+    local_tokens.delete(key)
+    cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TimedAuthenticationMixin, authentication.TokenAuthentication):
+    """
+    TokenAuthentication with the token lookup cached by get_token.
+    aauthenticate() is the same for async views.
+    """
+
+    def authenticate_credentials(self, key):
+        return self.check_token(get_token(key))
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.check_token(await aget_token(key, pool=READS))
+
+    def get_key(self, request):
+        """
+        Returns the key of the Authorization header, or None if it holds no
+        token.  Raises AuthenticationFailed for a malformed one.
+        """
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. No credentials provided.')
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Token string should not contain spaces.')
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Token string should not contain invalid characters.')
+
+    def check_token(self, token):
+        if token is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (token.user, token)
@@ -0,0 +1,118 @@
+"""
+Token authentication of websockets.
+
+TokenAuthMiddleware sets scope['user'] from a DRF token, sent either way:
+
+- as a subprotocol, by opening the socket with the protocols
+  ``["token", "<key>"]``.  The socket is accepted with the "token" protocol.
+- in the first frame, ``{"type": "auth", "token": "<key>"}``, which is
+  answered with ``{"type": "auth", "authenticated": true|false}`` and not
+  passed on to the consumer.
+
+The token is looked up through user.authentication.aget_token, so most
+connects are served from the cache.  A socket without a token is anonymous
+from the start, and costs no lookup at all.
+"""
+import json
+from channels.auth import UserLazyObject
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from .authentication import aget_token
+
+
+TOKEN_SUBPROTOCOL = 'token'
+
+
+def get_subprotocol_token(subprotocols):
+    """
+    Returns the key that follows the token protocol, if any.
+    """
+    try:
+        return subprotocols[subprotocols.index(TOKEN_SUBPROTOCOL) + 1]
+    except (ValueError, IndexError):
+        return None
+
+
+def get_frame_token(message):
+    """
+    Returns the key of an auth frame, or None for any other frame.
+    """
+    try:
+        content = json.loads(message.get('text') or '')
+    except ValueError:
+        return None
+    if not isinstance(content, dict) or content.get('type') != 'auth':
+        return None
+    token = content.get('token')
+    return token if isinstance(token, str) else ''
+
+
+async def get_token_user(key):
+    """
+    Returns the active user of the token, or AnonymousUser.
+    """
+    token = await aget_token(key)
+    if token is None or not token.user.is_active:
+        return AnonymousUser()
+    return token.user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates websockets by DRF token, for the consumers below it.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'websocket':
+            return await super().__call__(scope, receive, send)
+
+        # The routers below copy the scope, so the user is set through a
+        # shared lazy object, which the first frame can still fill in
+        scope = dict(scope, user=UserLazyObject())
+        scope['user']._wrapped = AnonymousUser()
+        key = get_subprotocol_token(scope.get('subprotocols', []))
+        if key is not None:
+            scope['user']._wrapped = await get_token_user(key)
+            send = self.accept_token_subprotocol(send)
+        else:
+            receive = self.authenticate_first_frame(scope['user'], receive, send)
+        return await self.inner(scope, receive, send)
+
+    def accept_token_subprotocol(self, send):
+        """
+        Wraps send to accept the socket with the token protocol, which a
+        browser that offered protocols requires.
+        """
+        async def send_with_subprotocol(message):
+            if message['type'] == 'websocket.accept' and not message.get('subprotocol'):
+                message = dict(message, subprotocol=TOKEN_SUBPROTOCOL)
+            await send(message)
+        return send_with_subprotocol
+
+    def authenticate_first_frame(self, user, receive, send):
+        """
+        Wraps receive to authenticate from the first frame, if it is an
+        auth frame.
+        """
+        first = True
+
+        async def receive_after_auth():
+            nonlocal first
+            message = await receive()
+            if not first or message['type'] != 'websocket.receive':
+                return message
+            first = False
+
+            key = get_frame_token(message)
+            if key is None:
+                return message
+            user._wrapped = await get_token_user(key)
+            await send({
+                'type': 'websocket.send',
+                'text': json.dumps({
+                    'type': 'auth',
+                    'authenticated': user.is_authenticated,
+                }),
+            })
+            return await receive()
+        return receive_after_auth
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_token
 from .models import UserProfile
 
 
@@ -13,3 +16,20 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # Wait for the commit, so a concurrent lookup cannot cache the old state.
+    # The key is the primary key, which delete() clears.
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    # The cached tokens carry their user, e.g. whether they are active
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        transaction.on_commit(lambda key=key: invalidate_token(key))
@@ -1,9 +1,28 @@
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from auction.models import Auction, Bid
+from auction.routing import websocket_urlpatterns
+from .authentication import LocalTokenCache, get_token, local_tokens, token_cache_key
+from .middleware import TokenAuthMiddleware
 from .serializers import UserSerializer
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+
+# The tests run without Redis, and with every database call in the thread of
+# the test, inside its transaction
+in_process = override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    EXECUTOR_POOLS={'ENABLED': False},
+)
 
 
 class UserRegistrationTests(APITestCase):
@@ -191,6 +210,7 @@ class UserLoginTests(APITestCase):
         self.assertEqual(response.data["error"], "Invalid credentials")
 
 
+@in_process
 class UserInfoTests(APITestCase):
     def setUp(self):
         # Create a test user
@@ -224,3 +244,208 @@ class UserInfoTests(APITestCase):
         self.client.credentials()  # Clear the default authentication
         response = self.client.get(self.user_me_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@in_process
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="testpassword",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.user_me_url = reverse('user_info')
+
+    def test_lookup_is_cached(self):
+        """
+        Test that the token is read from the database once, then from the
+        local cache, and from the shared cache in another process.  The
+        other query of each request is user_info loading the full user.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(self.user_me_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.user_me_url)
+        self.assertEqual(response.data['username'], "testuser")
+
+        # As seen by a process with an empty local cache
+        local_tokens.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.user_me_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_no_secrets_cached(self):
+        """
+        Test that the shared cache holds no password hash or contact
+        details, and that the user of a cached token loads them on demand.
+        """
+        self.client.get(self.user_me_url)
+        cached = cache.get(token_cache_key(self.token.key))
+        self.assertNotIn(self.user.password, cached)
+        self.assertNotIn(self.user.email, cached)
+
+        user = get_token(self.token.key).user
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertEqual(user.username, "testuser")
+        self.assertEqual(user.email, self.user.email)
+
+    def test_deleted_token(self):
+        """
+        Test that a deleted token stops working at once.
+        """
+        self.client.get(self.user_me_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        response = self.client.get(self.user_me_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user(self):
+        """
+        Test that the token of a deactivated user stops working at once.
+        """
+        self.client.get(self.user_me_url)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(self.user_me_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token(self):
+        """
+        Test that an unknown token is rejected and not cached.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        response = self.client.get(self.user_me_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(cache.get(token_cache_key('invalid')))
+        self.assertIsNone(local_tokens.get('invalid'))
+
+    def test_local_cache_bounds(self):
+        """
+        Test that the local cache evicts the least recently used entry when
+        full, and drops entries past their timeout.
+        """
+        tokens = LocalTokenCache()
+        tokens.set('a', 1, 60, 2)
+        tokens.set('b', 2, 60, 2)
+        tokens.get('a')
+        tokens.set('c', 3, 60, 2)
+        self.assertIsNone(tokens.get('b'))
+        self.assertEqual((tokens.get('a'), tokens.get('c')), (1, 3))
+
+        tokens.set('d', 4, 0, 2)
+        self.assertIsNone(tokens.get('d'))
+
+
+@in_process
+class TokenAuthMiddlewareTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.seller = User.objects.create_user(username="seller", password="sellerpassword")
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.token = Token.objects.create(user=self.user)
+        self.auction = Auction.objects.create(
+            seller=self.seller,
+            title='Live Auction',
+            starting_price=10.00,
+            end_time=timezone.now() + timezone.timedelta(days=1),
+        )
+        self.path = f'/ws/auction/{self.auction.pk}/'
+
+    def get_communicator(self, subprotocols=None):
+        return WebsocketCommunicator(
+            TokenAuthMiddleware(URLRouter(websocket_urlpatterns)), self.path,
+            subprotocols=subprotocols)
+
+    async def bid(self, communicator):
+        await communicator.send_json_to({'type': 'bid', 'bid': {'amount': '20'}, 'ref': 1})
+        while True:
+            frame = await communicator.receive_json_from()
+            if frame['type'] in ('bid_ack', 'bid_nack'):
+                return frame
+
+    def test_subprotocol_token(self):
+        """
+        Test that a token sent as a subprotocol authenticates the socket,
+        which is accepted with the token protocol.
+        """
+        async def run():
+            communicator = self.get_communicator(['token', self.token.key])
+            connected, subprotocol = await communicator.connect()
+            await communicator.receive_json_from()
+            frame = await self.bid(communicator)
+            await communicator.disconnect()
+            return connected, subprotocol, frame
+
+        connected, subprotocol, frame = async_to_sync(run)()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, 'token')
+        self.assertEqual(frame['type'], 'bid_ack')
+        self.assertEqual(Bid.objects.get(pk=frame['bid']['id']).bidder, self.user)
+
+    def test_first_frame_token(self):
+        """
+        Test that an auth first frame authenticates the socket and is
+        answered, and that an invalid token leaves it anonymous.
+        """
+        async def run(key):
+            communicator = self.get_communicator()
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await communicator.send_json_to({'type': 'auth', 'token': key})
+            reply = await communicator.receive_json_from()
+            frame = await self.bid(communicator)
+            await communicator.disconnect()
+            return reply, frame
+
+        reply, frame = async_to_sync(run)('invalid')
+        self.assertEqual(reply, {'type': 'auth', 'authenticated': False})
+        self.assertEqual(frame['code'], 'not_authenticated')
+
+        reply, frame = async_to_sync(run)(self.token.key)
+        self.assertEqual(reply, {'type': 'auth', 'authenticated': True})
+        self.assertEqual(frame['type'], 'bid_ack')
+
+    def test_anonymous_watcher(self):
+        """
+        Test that a socket without a token is anonymous without any token
+        lookup, and still gets the auction's events.
+        """
+        async def run():
+            communicator = self.get_communicator()
+            connected, subprotocol = await communicator.connect()
+            initial = await communicator.receive_json_from()
+            frame = await self.bid(communicator)
+            await communicator.disconnect()
+            return connected, subprotocol, initial, frame
+
+        with mock.patch('user.middleware.aget_token') as aget_token:
+            connected, subprotocol, initial, frame = async_to_sync(run)()
+        aget_token.assert_not_called()
+        self.assertTrue(connected)
+        self.assertIsNone(subprotocol)
+        self.assertEqual(initial['type'], 'initial_data')
+        self.assertEqual(frame['code'], 'not_authenticated')
+
+    def test_inactive_user(self):
+        """
+        Test that the token of an inactive user leaves the socket anonymous.
+        """
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        async def run():
+            communicator = self.get_communicator(['token', self.token.key])
+            await communicator.connect()
+            await communicator.receive_json_from()
+            frame = await self.bid(communicator)
+            await communicator.disconnect()
+            return frame
+
+        self.assertEqual(async_to_sync(run)()['code'], 'not_authenticated')
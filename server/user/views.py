@@ -4,6 +4,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from server.async_views import AsyncReadView
 from .serializers import UserSerializer
 
 
@@ -37,8 +39,29 @@ def login_user(request):
     return Response({'error': 'Please provide username and password'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def get_full_user(user):
+    """
+    Returns the user with every field loaded.  A user authenticated by a
+    cached token only carries the fields cached for authentication.
+    """
+    if user.get_deferred_fields():
+        return User.objects.get(pk=user.pk)
+    return user
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_info(request):
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(get_full_user(request.user))
     return Response(serializer.data)
+
+
+class AsyncUserInfoView(AsyncReadView):
+    """
+    user_info on the event loop.
+    """
+    authentication_required = True
+
+    async def get(self, request):
+        user = await self.read(get_full_user, request.user)
+        return Response(UserSerializer(user).data)